@@ -1,20 +1,47 @@
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime
+from appointments import AppointmentRepository
+from availability import AvailabilityIndex
+from escalations import EscalationQueue
+from human_input import ask_user, confirm, interactive
+from model_tiers import CHEAP_MODEL, STRONG_MODEL
 from rag import DentalServiceRAG
+import asyncio
+import os
+import threading
 
-# Initialize RAG with the dataset path
+# Initialize RAG with the dataset path. The index is loaded lazily: main.py starts the load on a
+# background thread at startup and the first retrieval awaits it.
 rag = DentalServiceRAG(data_folder="../data", filename="dental_clinic_data.csv")
-rag.load_and_index_data()
+
+# Durable appointment store shared by all sessions; opened and seeded from the CSV on first use.
+APPOINTMENTS_DB = os.getenv("APPOINTMENTS_DB", "../data/appointments.sqlite")
+repository = None
+
+# Escalations go to a persistent outbox drained by background workers instead of stopping the server.
+ESCALATIONS_DB = os.getenv("ESCALATIONS_DB", "../data/escalations.sqlite")
+escalation_queue = None
+
+
+def get_escalation_queue():
+    global escalation_queue
+    if escalation_queue is None:
+        escalation_queue = EscalationQueue(ESCALATIONS_DB, workers=int(os.getenv("ESCALATION_WORKERS", "2")))
+    return escalation_queue
 
 class Agent(BaseModel):
     name: str = "Agent"
     model: str = "gpt-4o-mini"
+    # Optional model per loop step ("routing", "answer", "escalation"); steps not listed use `model`.
+    models: dict = {}
     instructions: str = "You are a helpful Agent"
     tools: list = []
 
 class Response(BaseModel):
     agent: Optional[Agent]
     messages: list
+    metrics: dict = {}
 
 def transfer_to_scheduling_agent():
     """Use for anything scheduling related."""
@@ -29,32 +56,137 @@ def transfer_back_to_qa():
     including escalating to human."""
     return qa_agent
 
-def execute_scheduling(date, event_type, reason):
-    print("\n\n=== Scheduling Summary ===")
-    print(f"Date: {date}")
-    print(f"Event: {event_type}")
-    print(f"Reason: {reason}")
-    print("=================")
-    confirm = input("Confirm event? y/n: ").strip().lower()
-    if confirm == "y":
+_availability = None
+_availability_source = None
+_availability_lock = threading.Lock()
+
+
+def get_availability():
+    """
+    In-memory availability index over the appointment repository, rebuilt whenever the CSV changes on disk.
+    Reads the tables directly, so scheduling works while (or even if) the RAG index is still being built.
+    """
+    global _availability, _availability_source, repository
+    stat = os.stat(rag.dataset_path)
+    source = (stat.st_mtime_ns, stat.st_size)
+    with _availability_lock:
+        if repository is None:
+            repository = AppointmentRepository(APPOINTMENTS_DB)
+        if _availability is None or _availability_source != source:
+            services, appointments = rag.read_tables()
+            repository.seed(appointments, services)
+            intervals = [(specialist, start, end) for _, specialist, _, start, end in repository.all()]
+            _availability = AvailabilityIndex.from_intervals(AvailabilityIndex.catalog_services(services), intervals)
+            _availability_source = source
+        return _availability
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(str(value).strip().replace("T", " "))
+    except ValueError:
+        return None
+
+
+def _format_slots(slots):
+    return ", ".join(slot.strftime("%Y-%m-%d %H:%M (%a)") for slot in slots) or "none in the next 60 days"
+
+
+def _resolve_service(availability, name):
+    service = availability.resolve_service(name)
+    if service is None:
+        return None, f"Unknown service '{name}'. Services: {', '.join(availability.services)}."
+    return service, None
+
+
+def check_availability(service: str, start: str):
+    """Check whether a service can be booked at a start time (YYYY-MM-DD HH:MM).
+    Suggests the next free slots when it cannot."""
+    availability = get_availability()
+    service, error = _resolve_service(availability, service)
+    if error:
+        return error
+    start_time = _parse_datetime(start)
+    if start_time is None:
+        return f"Could not read '{start}'. Use the format YYYY-MM-DD HH:MM."
+    ok, reason = availability.check_slot(service, start_time)
+    if ok:
+        specialist, duration = availability.services[service]
+        return f"{start_time:%Y-%m-%d %H:%M} is free for {service} with {specialist} ({duration} minutes)."
+    alternatives = availability.next_free_slots(service, max(start_time, datetime.now()))
+    return f"{start_time:%Y-%m-%d %H:%M} is not available: {reason}. Next free slots: {_format_slots(alternatives)}."
+
+
+def find_free_slots(service: str, after: str = "", count: int = 3):
+    """List the next free start times for a service, optionally after a date/time (YYYY-MM-DD HH:MM)."""
+    availability = get_availability()
+    service, error = _resolve_service(availability, service)
+    if error:
+        return error
+    after_time = _parse_datetime(after) if after else None
+    if after and after_time is None:
+        return f"Could not read '{after}'. Use the format YYYY-MM-DD HH:MM."
+    after_time = max(after_time or datetime.now(), datetime.now())
+    specialist, duration = availability.services[service]
+    slots = availability.next_free_slots(service, after_time, count=max(1, min(int(count), 10)))
+    return f"{service} with {specialist} ({duration} minutes): {_format_slots(slots)}."
+
+
+@interactive
+async def execute_scheduling(date, event_type, reason, patient_name: str = ""):
+    """Book an appointment. `date` is the start time (YYYY-MM-DD HH:MM) and `event_type` the service name.
+    The slot is checked against the specialist's calendar and confirmed with the user in the chat."""
+    availability = await asyncio.to_thread(get_availability)
+    service, error = _resolve_service(availability, event_type)
+    if error:
+        return error
+    start_time = _parse_datetime(date)
+    if start_time is None:
+        return f"Could not read '{date}'. Use the format YYYY-MM-DD HH:MM."
+    ok, conflict = availability.check_slot(service, start_time)
+    if not ok:
+        alternatives = availability.next_free_slots(service, max(start_time, datetime.now()))
+        return f"Not booked: {conflict}. Next free slots: {_format_slots(alternatives)}."
+
+    specialist, duration = availability.services[service]
+    summary = (
+        f"Please confirm your appointment: {service} with {specialist} on {start_time:%Y-%m-%d at %H:%M} "
+        f"({duration} minutes) for {patient_name or 'you'}. Reason: {reason}."
+    )
+    print(f"Scheduling: {summary}")
+    # Suspends only this session's turn until the user answers in the chat
+    if await confirm(summary):
+        if start_time < datetime.now():
+            alternatives = availability.next_free_slots(service, datetime.now())
+            return f"Not booked: {start_time:%Y-%m-%d %H:%M} passed while waiting for confirmation. Next free slots: {_format_slots(alternatives)}."
+        # The repository is the source of truth: another session or worker may have taken the slot meanwhile.
+        booking = await asyncio.to_thread(repository.book, service, specialist, patient_name, start_time, duration)
+        if booking is None:
+            alternatives = availability.next_free_slots(service, start_time)
+            return f"Not booked: {specialist} was booked by someone else in the meantime. Next free slots: {_format_slots(alternatives)}."
+        availability.book(service, start_time)
         print("Event scheduled successfully!")
         return "Success"
     else:
         print("Event cancelled!")
         return "User cancelled order."
 
-def escalate_to_human(summary):
+async def escalate_to_human(summary):
     """Only call this if explicitly asked to."""
     print("Escalating to human agent...")
-    print("\n=== Escalation Report ===")
-    print(f"Summary: {summary}")
-    print("=========================")
-    exit()
+    queue = get_escalation_queue()
+    ticket = await queue.enqueue(summary)
+    print("Escalation queue:", await asyncio.to_thread(queue.stats))
+    return (
+        f"Escalated to a human colleague as ticket #{ticket}. "
+        "Tell the user a staff member will contact them shortly and that they can keep chatting meanwhile."
+    )
 
-def collect_human_feedback():
+@interactive
+async def collect_human_feedback():
     """Prompt the user for feedback after completing tasks."""
-    user_feedback = input("We'd love your feedback to improve our service: ")
-    return user_feedback
+    user_feedback = await ask_user("We'd love your feedback to improve our service:")
+    return user_feedback or "The user did not leave feedback."
 
 qa_agent = Agent(
     name="Q&A Agent",
@@ -78,7 +210,9 @@ qa_agent = Agent(
         '6. Always use a professional, empathetic tone to guide users effectively.'
 
     ),
-    tools=[transfer_to_scheduling_agent, transfer_to_feedback_agent, escalate_to_human, rag.retrieve],
+    tools=[transfer_to_scheduling_agent, transfer_to_feedback_agent, escalate_to_human, rag.aretrieve],
+    # Picking a tool is cheap; the answers patients read come from the stronger model.
+    models={"routing": CHEAP_MODEL, "answer": STRONG_MODEL, "escalation": STRONG_MODEL},
 )
 
 scheduling_agent = Agent(
@@ -102,11 +236,15 @@ scheduling_agent = Agent(
         'Behavioral Guidelines:\n'
         '- Maintain a polite, user-friendly tone while confirming and adjusting appointments.\n'
         '- Always verify booking details with the user before confirmation.\n'
+        '- Ask for the patient name before booking.\n'
+        '- Use check_availability and find_free_slots to look up the clinic calendar; never guess availability.\n'
         '- Always verify if desired date is in future from 2025-01-26, if user wants to book in past, tell them to book in future.\n'
         '- Share any required pre-appointment preparation steps.'
 
     ),
-    tools=[execute_scheduling, transfer_back_to_qa, transfer_to_feedback_agent],
+    tools=[check_availability, find_free_slots, execute_scheduling, transfer_back_to_qa, transfer_to_feedback_agent],
+    # Mostly tool calls and short confirmations; only invalid bookings are retried on the stronger model.
+    models={"routing": CHEAP_MODEL, "answer": CHEAP_MODEL, "escalation": STRONG_MODEL},
 )
 
 feedback_agent = Agent(
@@ -120,4 +258,5 @@ feedback_agent = Agent(
         '3. Redirect to the Q&A Agent if users ask additional service-related questions.'
     ),
     tools=[collect_human_feedback, transfer_back_to_qa],
+    models={"routing": CHEAP_MODEL, "answer": CHEAP_MODEL, "escalation": STRONG_MODEL},
 )
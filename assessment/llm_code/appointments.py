@@ -0,0 +1,149 @@
+from contextlib import closing
+from datetime import datetime, timedelta
+import hashlib
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY,
+    service TEXT NOT NULL,
+    specialist TEXT NOT NULL,
+    patient TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    duration_minutes INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS appointments_specialist_start ON appointments (specialist, start);
+CREATE INDEX IF NOT EXISTS appointments_patient ON appointments (patient);
+CREATE INDEX IF NOT EXISTS appointments_duration ON appointments (duration_minutes);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _to_text(value):
+    return value.strftime(TIME_FORMAT)
+
+
+class AppointmentRepository:
+    def __init__(self, path):
+        """
+        Durable appointment store on SQLite in WAL mode, safe to share between sessions, threads and processes.
+        Bookings run in IMMEDIATE transactions, so the overlap check and the insert are atomic per specialist.
+        :param path: SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.commit()
+
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so transactions are opened explicitly with BEGIN IMMEDIATE.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def seed(self, appointments, services):
+        """
+        Load the CSV appointment rows, replacing previously seeded rows when the CSV changed.
+        Bookings made through `book` are kept.
+        :param appointments: DentalServiceRAG.appointments table.
+        :param services: DentalServiceRAG.services table, for appointment durations.
+        :return: True if the rows were (re)seeded.
+        """
+        durations = services.set_index("Service Name")["Duration (mins)"].fillna(30)
+        minutes = appointments["Service Name"].map(durations).fillna(30).astype(int)
+        starts = appointments["Appointment Date"]
+        ends = starts + minutes.astype("timedelta64[m]")
+        rows = list(zip(
+            appointments["Service Name"],
+            appointments["Specialist"],
+            appointments["Patient Name"].fillna(""),
+            starts.dt.strftime(TIME_FORMAT),
+            ends.dt.strftime(TIME_FORMAT),
+            minutes,
+        ))
+        digest = hashlib.sha256(repr(rows).encode("utf-8")).hexdigest()
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = conn.execute("SELECT value FROM meta WHERE key = 'seed'").fetchone()
+            if stored and stored[0] == digest:
+                conn.execute("ROLLBACK")
+                return False
+            now = _to_text(datetime.now())
+            conn.execute("DELETE FROM appointments WHERE source = 'csv'")
+            conn.executemany(
+                "INSERT INTO appointments (service, specialist, patient, start, end, duration_minutes, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'csv', ?)",
+                [(*row[:5], int(row[5]), now) for row in rows],
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seed', ?)", (digest,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def book(self, service, specialist, patient, start, duration_minutes):
+        """
+        Book a slot unless it overlaps another appointment of the same specialist.
+        :return: The new appointment id, or None when the slot is taken.
+        """
+        end = start + timedelta(minutes=duration_minutes)
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so no other writer can slip in between check and insert.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            longest = conn.execute("SELECT COALESCE(MAX(duration_minutes), 0) FROM appointments").fetchone()[0]
+            # Bounding `start` from below keeps the overlap check a short range scan of the (specialist, start) index.
+            clash = conn.execute(
+                "SELECT 1 FROM appointments WHERE specialist = ? AND start > ? AND start < ? AND end > ? LIMIT 1",
+                (specialist, _to_text(start - timedelta(minutes=longest + 1)), _to_text(end), _to_text(start)),
+            ).fetchone()
+            if clash:
+                conn.execute("ROLLBACK")
+                return None
+            cursor = conn.execute(
+                "INSERT INTO appointments (service, specialist, patient, start, end, duration_minutes, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'booking', ?)",
+                (service, specialist, patient, _to_text(start), _to_text(end), duration_minutes, _to_text(datetime.now())),
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def all(self):
+        """Every appointment as (service, specialist, patient, start, end) rows ordered by specialist and start."""
+        rows = self._connection().execute(
+            "SELECT service, specialist, patient, start, end FROM appointments ORDER BY specialist, start"
+        ).fetchall()
+        return [(service, specialist, patient, datetime.strptime(start, TIME_FORMAT), datetime.strptime(end, TIME_FORMAT)) for service, specialist, patient, start, end in rows]
+
+    def for_patient(self, patient):
+        rows = self._connection().execute(
+            "SELECT service, specialist, start FROM appointments WHERE patient = ? ORDER BY start", (patient,)
+        ).fetchall()
+        return [(service, specialist, datetime.strptime(start, TIME_FORMAT)) for service, specialist, start in rows]
+
+    def count_overlaps(self):
+        """Number of overlapping pairs among booked (non-CSV) appointments; 0 unless booking is broken."""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM appointments a JOIN appointments b "
+            "ON a.specialist = b.specialist AND a.id < b.id AND a.start < b.end AND b.start < a.end "
+            "WHERE a.source = 'booking' AND b.source = 'booking'"
+        ).fetchone()[0]
@@ -0,0 +1,168 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import groupby
+import threading
+
+
+class AvailabilityIndex:
+    def __init__(self, services, opening_hour=8, closing_hour=18, slot_minutes=15, working_days=(0, 1, 2, 3, 4, 5)):
+        """
+        Per-specialist calendar of busy intervals kept as sorted, merged (start, end) blocks, so a slot check
+        is two binary searches and a free-slot search skips whole busy blocks at a time.
+        :param services: Mapping of service name -> (specialist, duration in minutes).
+        :param opening_hour: First hour a new appointment may start.
+        :param closing_hour: Hour by which a new appointment must have ended.
+        :param slot_minutes: Granularity of offered start times.
+        :param working_days: Weekdays (Monday=0) the clinic takes appointments.
+        """
+        self.services = dict(services)
+        self.opening_hour = opening_hour
+        self.closing_hour = closing_hour
+        self.slot = timedelta(minutes=slot_minutes)
+        self.working_days = frozenset(working_days)
+        # specialist -> (sorted block starts, aligned block ends). A booking replaces the pair in one assignment
+        # instead of editing the lists, so readers never take the lock and never see half an update.
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def catalog_services(services, default_duration=30):
+        """Service name -> (specialist, duration in minutes) from DentalServiceRAG's service table."""
+        durations = services["Duration (mins)"].fillna(default_duration).astype(int)
+        return {name: (specialist, duration) for name, specialist, duration in zip(services["Service Name"], services["Specialist"], durations)}
+
+    @classmethod
+    def from_catalog(cls, services, appointments, default_duration=30, **kwargs):
+        """
+        Build the index from DentalServiceRAG's service and appointment tables.
+        Each appointment lasts its service's `Duration (mins)`.
+        """
+        index = cls(cls.catalog_services(services, default_duration), **kwargs)
+        durations = services.set_index("Service Name")["Duration (mins)"].fillna(default_duration)
+        minutes = appointments["Service Name"].map(durations).fillna(default_duration)
+        intervals = appointments.assign(End=appointments["Appointment Date"] + minutes.astype("timedelta64[m]"))
+        for specialist, group in intervals.sort_values("Appointment Date").groupby("Specialist", sort=False):
+            index._load_sorted(specialist, group["Appointment Date"].array.to_pydatetime(), group["End"].array.to_pydatetime())
+        return index
+
+    @classmethod
+    def from_intervals(cls, services, intervals, **kwargs):
+        """
+        Build the index from (specialist, start, end) rows sorted by specialist and start,
+        e.g. the contents of the appointment repository.
+        """
+        index = cls(services, **kwargs)
+        for specialist, group in groupby(intervals, key=lambda row: row[0]):
+            group = list(group)
+            index._load_sorted(specialist, [row[1] for row in group], [row[2] for row in group])
+        return index
+
+    def _load_sorted(self, specialist, starts, ends):
+        """Merge intervals already sorted by start into disjoint busy blocks in one pass."""
+        merged_starts, merged_ends = [], []
+        for start, end in zip(starts, ends):
+            if merged_ends and start <= merged_ends[-1]:
+                merged_ends[-1] = max(merged_ends[-1], end)
+            else:
+                merged_starts.append(start)
+                merged_ends.append(end)
+        self._blocks[specialist] = (merged_starts, merged_ends)
+
+    def resolve_service(self, name):
+        """Match a service name case-insensitively, accepting partial names such as "whitening"."""
+        wanted = " ".join(str(name).lower().split())
+        for service in self.services:
+            if service.lower() == wanted:
+                return service
+        matches = [service for service in self.services if wanted in service.lower() or service.lower() in wanted]
+        return matches[0] if len(matches) == 1 else None
+
+    def is_free(self, specialist, start, end):
+        """True when no busy block of the specialist overlaps [start, end)."""
+        starts, ends = self._blocks.get(specialist, ([], []))
+        i = bisect_right(starts, start)
+        if i > 0 and ends[i - 1] > start:
+            return False
+        return i == len(starts) or starts[i] >= end
+
+    def check_slot(self, service, start, now=None):
+        """
+        :param now: Reference time; earlier starts are rejected. Defaults to the current time.
+        :return: (True, None) when `service` can start at `start`, else (False, reason).
+        """
+        specialist, duration = self.services[service]
+        end = start + timedelta(minutes=duration)
+        if start < (now or datetime.now()):
+            return False, "that time is in the past"
+        if not self._within_opening_hours(start, end):
+            return False, f"outside opening hours ({self.opening_hour}:00-{self.closing_hour}:00, {self._day_names()})"
+        if not self.is_free(specialist, start, end):
+            return False, f"{specialist} is already booked at that time"
+        return True, None
+
+    def book(self, service, start, now=None):
+        """Atomically check and reserve a slot. :return: (booked, reason)."""
+        specialist, duration = self.services[service]
+        with self._lock:
+            ok, reason = self.check_slot(service, start, now)
+            if ok:
+                self._insert(specialist, start, start + timedelta(minutes=duration))
+        return ok, reason
+
+    def next_free_slots(self, service, after, count=3, horizon_days=60):
+        """
+        The first `count` start times at or after `after` when the service's specialist is free for its full duration.
+        """
+        specialist, duration = self.services[service]
+        length = timedelta(minutes=duration)
+        starts, ends = self._blocks.get(specialist, ([], []))
+        limit = after + timedelta(days=horizon_days)
+        slots = []
+        t = self._round_up(after)
+        while len(slots) < count and t < limit:
+            t = self._next_opening(t, length)
+            i = bisect_right(starts, t)
+            if i > 0 and ends[i - 1] > t:
+                t = self._round_up(ends[i - 1])
+                continue
+            if i < len(starts) and starts[i] < t + length:
+                t = self._round_up(ends[i])
+                continue
+            slots.append(t)
+            t = self._round_up(t + length)
+        return slots
+
+    def _insert(self, specialist, start, end):
+        starts, ends = self._blocks.get(specialist, ([], []))
+        i = bisect_left(starts, start)
+        if i > 0 and ends[i - 1] >= start:
+            i -= 1
+            start = starts[i]
+        j = i
+        while j < len(starts) and starts[j] <= end:
+            end = max(end, ends[j])
+            j += 1
+        self._blocks[specialist] = (starts[:i] + [start] + starts[j:], ends[:i] + [end] + ends[j:])
+
+    def _within_opening_hours(self, start, end):
+        opening = start.replace(hour=self.opening_hour, minute=0, second=0, microsecond=0)
+        closing = start.replace(hour=self.closing_hour, minute=0, second=0, microsecond=0)
+        return start.weekday() in self.working_days and opening <= start and end <= closing
+
+    def _next_opening(self, t, length):
+        """Move `t` forward to the first start inside opening hours that leaves room for `length`."""
+        while True:
+            opening = t.replace(hour=self.opening_hour, minute=0, second=0, microsecond=0)
+            closing = t.replace(hour=self.closing_hour, minute=0, second=0, microsecond=0)
+            if t.weekday() in self.working_days and t + length <= closing:
+                return max(t, opening)
+            t = opening + timedelta(days=1)
+
+    def _round_up(self, t):
+        midnight = t.replace(hour=0, minute=0, second=0, microsecond=0)
+        slots = -(-(t - midnight) // self.slot)
+        return midnight + slots * self.slot
+
+    def _day_names(self):
+        names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        return ", ".join(names[day] for day in sorted(self.working_days))
@@ -0,0 +1,87 @@
+"""
+Benchmark for the appointment availability index.
+
+Generates a synthetic calendar (default 100k appointments over the clinic's specialists and services),
+builds the AvailabilityIndex and times slot checks and free-slot searches against a linear scan of the
+appointment table, which is what answering the same questions without an index costs.
+
+Run from assessment/llm_code:
+    python bench_availability.py --appointments 100000 --queries 2000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from availability import AvailabilityIndex
+
+
+def synthetic_catalog(num_appointments, num_specialists, seed=0):
+    rng = random.Random(seed)
+    specialists = [f"Dr. Specialist {i}" for i in range(num_specialists)]
+    services = pd.DataFrame({
+        "Service Name": [f"Service {i}" for i in range(num_specialists * 2)],
+        "Specialist": [specialists[i % num_specialists] for i in range(num_specialists * 2)],
+        "Duration (mins)": [rng.choice([30, 45, 60, 90]) for _ in range(num_specialists * 2)],
+    })
+    base = datetime(2024, 1, 1, 8)
+    rows = []
+    for _ in range(num_appointments):
+        service = services.iloc[rng.randrange(len(services))]
+        start = base + timedelta(days=rng.randrange(730), minutes=15 * rng.randrange(40))
+        rows.append((service["Service Name"], service["Specialist"], start))
+    appointments = pd.DataFrame(rows, columns=["Service Name", "Specialist", "Appointment Date"])
+    return services, appointments, base
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return f"p50 {statistics.median(samples) * 1e6:8.1f} us   p99 {samples[int(len(samples) * 0.99)] * 1e6:8.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--specialists", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    services, appointments, base = synthetic_catalog(args.appointments, args.specialists)
+    start = time.perf_counter()
+    index = AvailabilityIndex.from_catalog(services, appointments)
+    print(f"build: {time.perf_counter() - start:.2f} s for {len(appointments)} appointments")
+
+    rng = random.Random(1)
+    names = services["Service Name"].tolist()
+    durations = services.set_index("Service Name")["Duration (mins)"]
+    queries = [(rng.choice(names), base + timedelta(days=rng.randrange(730), minutes=15 * rng.randrange(40))) for _ in range(args.queries)]
+
+    indexed, slots = [], []
+    for service, at in queries:
+        t = time.perf_counter()
+        index.check_slot(service, at, now=base)
+        indexed.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        index.next_free_slots(service, at, count=5)
+        slots.append(time.perf_counter() - t)
+
+    # Baseline: overlap test over the specialist's rows of the appointment table for every check.
+    ends = appointments["Appointment Date"] + appointments["Service Name"].map(durations).astype("timedelta64[m]")
+    scanned = []
+    for service, at in queries[:200]:
+        specialist, duration = index.services[service]
+        t = time.perf_counter()
+        mask = (appointments["Specialist"] == specialist) & (appointments["Appointment Date"] < at + timedelta(minutes=int(duration))) & (ends > at)
+        bool(mask.any())
+        scanned.append(time.perf_counter() - t)
+
+    print(f"is-free (index):        {percentiles(indexed)}")
+    print(f"next 5 free (index):    {percentiles(slots)}")
+    print(f"is-free (table scan):   {percentiles(scanned)}")
+
+
+if __name__ == "__main__":
+    main()
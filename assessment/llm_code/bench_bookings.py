@@ -0,0 +1,86 @@
+"""
+Multi-session booking load test for the SQLite appointment repository.
+
+Starts --sessions concurrent workers (threads, like the tool thread pool serving many Chainlit sessions,
+optionally spread over --processes worker processes) that all try to book random slots with a few specialists,
+so many attempts collide. Reports successful bookings/sec, rejected attempts and verifies that no two bookings
+of the same specialist overlap.
+
+Run from assessment/llm_code:
+    python bench_bookings.py --sessions 32 --attempts 200 --processes 2
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from appointments import AppointmentRepository
+
+SERVICES = [("Teeth Cleaning", "Dr. Emily Turner", 45), ("Root Canal", "Dr. Emily Turner", 90),
+            ("Teeth Whitening", "Dr. Amelia Rivera", 60), ("Dental Fillings", "Dr. Amelia Rivera", 30),
+            ("Orthodontic Consultation", "Dr. James Holt", 45)]
+
+
+def worker(path, sessions, attempts, days, seed, results):
+    repository = AppointmentRepository(path)
+    base = datetime(2030, 1, 7, 8)
+    counts = {"booked": 0, "rejected": 0}
+    lock = threading.Lock()
+
+    def session(session_id):
+        rng = random.Random(seed * 1000 + session_id)
+        booked = rejected = 0
+        for _ in range(attempts):
+            service, specialist, duration = rng.choice(SERVICES)
+            start = base + timedelta(days=rng.randrange(days), minutes=15 * rng.randrange(36))
+            if repository.book(service, specialist, f"patient-{seed}-{session_id}", start, duration) is None:
+                rejected += 1
+            else:
+                booked += 1
+        with lock:
+            counts["booked"] += booked
+            counts["rejected"] += rejected
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32, help="Concurrent sessions per process.")
+    parser.add_argument("--attempts", type=int, default=200, help="Booking attempts per session.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--days", type=int, default=365, help="Calendar span; fewer days means more collisions.")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "appointments.sqlite")
+    AppointmentRepository(path)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, args.sessions, args.attempts, args.days, seed, results)) for seed in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = {"booked": 0, "rejected": 0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    attempts = totals["booked"] + totals["rejected"]
+    print(f"{args.processes} processes x {args.sessions} sessions x {args.attempts} attempts in {elapsed:.2f} s")
+    print(f"attempts/sec {attempts / elapsed:8.0f}   bookings/sec {totals['booked'] / elapsed:8.0f}   rejected {totals['rejected']}")
+    print(f"overlapping bookings: {AppointmentRepository(path).count_overlaps()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Offline load test of the whole agent loop.
+
+Starts the scripted OpenAI stand-in from mock_openai.py (or uses --base-url), then simulates N concurrent
+Chainlit sessions that each send a scripted conversation through `handle_message`, so every turn goes through
+sessions, the response cache, `run_full_turn`, tool execution, handoffs and the rate-limited client exactly as
+in production. Confirmations and feedback prompts are answered through `human_input.handler`.
+Reports p50/p95/p99 turn latency, throughput, completions per turn and memory.
+
+Run from assessment/llm_code:
+    python bench_load.py --sessions 200 --turns 6 --latency 0.3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+CONVERSATION = [
+    "Hi, what does a root canal cost?",
+    "How long does teeth whitening take?",
+    "I would like to book an appointment for a cleaning",
+    "Which slots are free next week?",
+    "Thanks, I have some feedback",
+    "One more question: what is an orthodontic consultation?",
+]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def answer_from_script(question, timeout):
+    """Scripted patient: confirms bookings and rates the visit."""
+    if "feedback" in question.lower() or "experience" in question.lower():
+        return "5 - quick and friendly"
+    return "yes"
+
+
+async def session(main, human_input, index, turns, think_time, vary, latencies):
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    init_http_context()
+    human_input.handler.set(answer_from_script)
+    for turn in range(turns):
+        content = CONVERSATION[turn % len(CONVERSATION)]
+        if vary:
+            content = f"{content} (patient {index})"
+        start = time.perf_counter()
+        await main.handle_message(cl.Message(content=content))
+        latencies.append(time.perf_counter() - start)
+        if think_time:
+            await asyncio.sleep(think_time)
+    await main.end_chat()
+
+
+async def run(args, base_url):
+    import agents
+    from langchain_openai import OpenAIEmbeddings
+
+    # Keep the mock embeddings out of the real index cache. The mock takes raw text, so skip the client-side
+    # tokenisation, which would otherwise need the tiktoken files.
+    agents.rag.index_folder = os.path.join(tempfile.mkdtemp(), ".index_cache")
+    agents.rag.embeddings = OpenAIEmbeddings(model=agents.rag.embedding_model, check_embedding_ctx_length=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        import human_input
+        await main.rag.await_ready()
+
+    latencies = []
+    if args.trace_memory:
+        tracemalloc.start()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    output = io.StringIO() if args.quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        await asyncio.gather(*(
+            session(main, human_input, i, args.turns, args.think_time, args.vary, latencies)
+            for i in range(args.sessions)
+        ))
+    elapsed = time.perf_counter() - start
+    peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    tracemalloc.stop()
+
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        server = json.load(response)
+    print(f"== {args.sessions} sessions x {args.turns} turns, mock latency {args.latency}s, stream={args.stream}")
+    print(f"  turns {len(latencies)} in {elapsed:.1f} s, throughput {len(latencies) / elapsed:.1f} turns/s")
+    print(f"  turn latency p50 {percentile(latencies, 50):.3f}s  p95 {percentile(latencies, 95):.3f}s  "
+          f"p99 {percentile(latencies, 99):.3f}s  mean {statistics.mean(latencies):.3f}s")
+    print(f"  completions {server['completions']} ({server['completions'] / len(latencies):.2f}/turn), "
+          f"tool calls {server['tool_calls']}, embeddings {server['embeddings']}, 429s {server['rate_limited']}")
+    traced = f"peak traced {peak_traced / 1e6:.1f} MB, " if peak_traced is not None else ""
+    print(f"  memory: {traced}max RSS {rss_mb():.0f} MB (before run {rss_before:.0f} MB)")
+    print(f"  client {main.llm.stats()}")
+    print(f"  sessions {main.sessions.stats()}")
+    if main.response_cache is not None:
+        print(f"  response cache {main.response_cache.stats()}")
+    if main.intent_router is not None:
+        router = main.intent_router.stats()
+        print(f"  intent router {router}, completions saved per conversation "
+              f"{router['completions_saved'] / args.sessions:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=len(CONVERSATION))
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock time to first token in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    # Generous by default so the harness measures the agent loop; set real account limits to see queueing.
+    parser.add_argument("--rpm", type=int, default=1_000_000)
+    parser.add_argument("--tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--max-concurrency", type=int, default=16, help="OpenAI requests in flight at once")
+    parser.add_argument("--router", action=argparse.BooleanOptionalAction, default=True,
+                        help="Switch agents with the local intent router before the first completion")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--vary", action=argparse.BooleanOptionalAction, default=True,
+                        help="Make every session's questions unique so the response cache cannot answer them")
+    parser.add_argument("--base-url", help="Use an already running mock server instead of starting one")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report tracemalloc peak (slows the run)")
+    parser.add_argument("--quiet", action=argparse.BooleanOptionalAction, default=True)
+    args = parser.parse_args()
+
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        from mock_openai import serve_in_process
+
+        _, base_url = serve_in_process(latency=args.latency, token_delay=args.token_delay, rate_limit_rate=args.rate_limit_rate)
+
+    # Everything the app persists goes to a scratch folder; the app reads these when it is imported.
+    scratch = tempfile.mkdtemp()
+    os.environ.update({
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_BASE": base_url,
+        "STREAM_RESPONSES": "1" if args.stream else "0",
+        "INTENT_ROUTER": "1" if args.router else "0",
+        "OPENAI_RPM": str(args.rpm),
+        "OPENAI_TPM": str(args.tpm),
+        "OPENAI_MAX_CONCURRENCY": str(args.max_concurrency),
+        "APPOINTMENTS_DB": os.path.join(scratch, "appointments.sqlite"),
+        "ESCALATIONS_DB": os.path.join(scratch, "escalations.sqlite"),
+        "SESSION_SPILL_PATH": os.path.join(scratch, "sessions.sqlite"),
+    })
+    asyncio.run(run(args, base_url))
+
+
+if __name__ == "__main__":
+    main()
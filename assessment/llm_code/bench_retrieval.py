@@ -0,0 +1,239 @@
+"""
+Retrieval benchmark and quality suite for DentalServiceRAG.
+
+For every catalog size a fresh interpreter generates a synthetic service catalog, indexes it with a
+deterministic local embedding (hashed words and character trigrams, so it runs offline and similar texts
+embed close together) and reports:
+- build: `load_and_index_data` from scratch, and reload from the on-disk index,
+- size: on-disk index folder, FAISS vectors, and process RSS growth,
+- latency: p50/p95 `retrieve` per top_k with the caches cleared, plus which path answered
+  (lexical fast path or hybrid),
+- quality: recall@k over a labelled query set, split into name queries ("price of <service name>") and
+  description queries (a few words from the description, one of them misspelt).
+
+Run from assessment/llm_code:
+    python bench_retrieval.py                                  # 10, 1k and 100k services
+    python bench_retrieval.py --sizes 1000000 --dim 64 --queries 100
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+AREAS = ["Molar", "Incisor", "Canine", "Gum", "Jaw", "Enamel", "Root", "Crown", "Bridge", "Implant", "Palate", "Nerve"]
+PROCEDURES = ["Cleaning", "Whitening", "Filling", "Extraction", "Sealant", "Scaling", "Polishing", "Repair",
+              "Reconstruction", "Assessment", "Therapy", "Contouring", "Grafting", "Alignment"]
+MODIFIERS = ["Pediatric", "Laser", "Ceramic", "Express", "Advanced", "Cosmetic", "Surgical", "Preventive",
+             "Digital", "Sedation", "Emergency", "Gentle"]
+GOALS = ["remove plaque", "relieve pain", "restore chewing", "brighten the smile", "protect against decay",
+         "straighten teeth", "treat infection", "replace missing teeth", "strengthen enamel", "reduce sensitivity"]
+SPECIALISTS = ["Dr. Emily Turner", "Dr. Amelia Rivera", "Dr. James Holt", "Dr. Olivia Chen", "Dr. Marcus Webb",
+               "Dr. Sofia Patel", "Dr. Liam Novak", "Dr. Hannah Brooks"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "pe", "su", "da", "fo", "gi", "ha", "ju", "be"]
+TOP_KS = [1, 3, 5, 10]
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, size=256):
+        """Deterministic offline embedding: signed feature hashing of words and their character trigrams."""
+        self.size = size
+        self._features = {}  # word -> (indices, signs)
+
+    def _word_features(self, word):
+        features = self._features.get(word)
+        if features is None:
+            padded = f"#{word}#"
+            grams = [word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+            hashes = np.array([zlib.crc32(gram.encode()) for gram in grams], dtype=np.uint32)
+            weights = np.full(len(grams), 0.5, dtype=np.float32)
+            weights[0] = 1.0  # the whole word counts more than each trigram
+            signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32) * weights
+            features = self._features[word] = ((hashes >> 1) % self.size, signs)
+        return features
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in text.lower().split():
+            word = "".join(ch for ch in word if ch.isalnum())
+            if word:
+                indices, signs = self._word_features(word)
+                np.add.at(vector, indices, signs)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def code_word(number):
+    """A pronounceable, unique made-up word per number, so every service name is distinct."""
+    word = ""
+    number += len(SYLLABLES)
+    while number:
+        number, digit = divmod(number, len(SYLLABLES))
+        word += SYLLABLES[digit]
+    return word.capitalize()
+
+
+def make_catalog(size, seed=0):
+    """Synthetic services in the CSV layout of dental_clinic_data.csv. :return: The rows, one dict per service."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        area, procedure, modifier = rng.choice(AREAS), rng.choice(PROCEDURES), rng.choice(MODIFIERS)
+        code = code_word(i)
+        goal = rng.choice(GOALS)
+        rows.append({
+            "Type": "Service",
+            "Service Name": f"{modifier} {area} {procedure} {code}",
+            "Description": f"{procedure} of the {area.lower()} area to {goal}, using the {code} protocol.",
+            "Price": float(rng.randrange(50, 2000)),
+            "Specialist": rng.choice(SPECIALISTS),
+            "Preparation": rng.choice(["None required.", "No food 2 hours before.", "Brush and floss beforehand."]),
+            "Duration (mins)": float(rng.choice([15, 30, 45, 60, 90])),
+            "Patient Name": "",
+            "Appointment Date": "",
+        })
+    return rows
+
+
+def typo(word, rng):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def make_queries(rows, count, seed=1):
+    """Labelled queries: (kind, query, expected service name)."""
+    rng = random.Random(seed)
+    queries = []
+    for row in rng.sample(rows, min(count, len(rows))):
+        name = row["Service Name"]
+        queries.append(("name", f"What is the price of {name}?", name))
+        words = [word.strip(",.") for word in row["Description"].split()]
+        content = [word for word in words if len(word) > 3 and word not in {"using", "protocol", "area"}]
+        picked = rng.sample(content, min(4, len(content)))
+        picked[0] = typo(picked[0], rng)
+        queries.append(("description", "I need something for " + " ".join(picked), name))
+    return queries
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def child(args):
+    import pandas as pd
+    from rag import DentalServiceRAG
+
+    folder = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        rows = make_catalog(args.size)
+        pd.DataFrame(rows).to_csv(os.path.join(folder, "catalog.csv"), index=False)
+        queries = make_queries(rows, args.queries)
+        del rows
+
+        def new_rag():
+            return DentalServiceRAG(data_folder=folder, filename="catalog.csv", index_folder=os.path.join(folder, "index"),
+                                    embeddings=HashingEmbeddings(args.dim))
+
+        rss_before = rss_bytes()
+        rag = new_rag()
+        start = time.perf_counter()
+        rag.load_and_index_data(force_rebuild=True)
+        build_seconds = time.perf_counter() - start
+        rss_growth = rss_bytes() - rss_before
+        index = rag.vector_store.index
+
+        start = time.perf_counter()
+        new_rag().load_and_index_data()
+        reload_seconds = time.perf_counter() - start
+
+        latency, recall, paths = {}, {}, {}
+        for top_k in TOP_KS:
+            rag.embedding_cache.clear()
+            rag.result_cache.clear()
+            rag.retrieval_paths.clear()
+            timings, hits = [], {}
+            for kind, query, expected in queries:
+                start = time.perf_counter()
+                results = rag.retrieve(query, top_k=top_k)
+                timings.append(time.perf_counter() - start)
+                found = any(result.startswith(f"Service: {expected}\n") for result in results)
+                hits.setdefault(kind, []).append(found)
+            latency[top_k] = {"p50_ms": percentile(timings, 50) * 1000, "p95_ms": percentile(timings, 95) * 1000}
+            recall[top_k] = {kind: sum(found) / len(found) for kind, found in hits.items()}
+            paths[top_k] = dict(rag.retrieval_paths)
+
+        print(json.dumps({
+            "size": args.size,
+            "build_seconds": build_seconds,
+            "reload_seconds": reload_seconds,
+            "disk_bytes": folder_size(os.path.join(folder, "index")),
+            "vector_bytes": index.ntotal * index.d * 4,
+            "rss_growth_bytes": rss_growth,
+            "latency": latency,
+            "recall": recall,
+            "paths": paths,
+        }))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000", help="Comma-separated catalog sizes")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--queries", type=int, default=200, help="Services sampled for labelled queries (2 queries each)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", "--size", str(size), "--dim", str(args.dim),
+               "--queries", str(args.queries)]
+        process = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if process.returncode != 0:
+            print(f"== {size} services: failed (exit {process.returncode})\n{process.stderr.strip()[-500:]}")
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        print(f"== {size} services, {args.dim} dims")
+        print(f"  build {result['build_seconds']:.2f} s, reload from disk {result['reload_seconds']:.2f} s")
+        print(f"  index on disk {result['disk_bytes'] / 1e6:.1f} MB, FAISS vectors {result['vector_bytes'] / 1e6:.1f} MB, "
+              f"RSS growth {result['rss_growth_bytes'] / 1e6:.1f} MB")
+        for top_k in TOP_KS:
+            latency, recall = result["latency"][str(top_k)], result["recall"][str(top_k)]
+            quality = "  ".join(f"{kind} {value:.3f}" for kind, value in recall.items())
+            print(f"  top_k {top_k:2d}: p50 {latency['p50_ms']:8.2f} ms  p95 {latency['p95_ms']:8.2f} ms  "
+                  f"recall@{top_k}: {quality}  paths {result['paths'][str(top_k)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Load test for per-session conversation state.
+
+Simulates many concurrent Chainlit chats, each sending turns through a SessionStore the way
+`handle_message` does, and samples traced memory as more chats arrive. With bounded settings the
+resident conversation state should stay flat; the unbounded run shows what a single ever-growing
+history per user costs.
+
+Run from assessment/llm_code:
+    python bench_sessions.py --chats 2000 --concurrency 300 --turns 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from agents import qa_agent, scheduling_agent, feedback_agent
+from sessions import SessionStore
+
+
+def fake_turn(turn):
+    """One user turn plus a tool round-trip and the assistant answer, ~1.5 KB of text."""
+    call_id = f"call_{turn}"
+    return [
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": "aretrieve", "arguments": '{"query": "root canal"}'}},
+        ]},
+        {"role": "tool", "tool_call_id": call_id, "content": "Service: Root Canal\nDescription: " + "x" * 500},
+        {"role": "assistant", "content": "A root canal takes about 90 minutes. " + "y" * 600},
+    ]
+
+
+async def chat(store, chat_id, turns, think_time):
+    for turn in range(turns):
+        session = await store.aget(chat_id)
+        session.messages.append({"role": "user", "content": f"question {turn} " + "z" * 200})
+        await asyncio.sleep(random.uniform(0, think_time))  # model + tool latency
+        session.messages.extend(fake_turn(turn))
+        await store.asave(session)
+    await store.aclose(chat_id)
+
+
+async def run(store, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples = []
+
+    async def one(chat_id):
+        async with semaphore:
+            await chat(store, chat_id, args.turns, args.think_time)
+
+    tasks = [asyncio.create_task(one(f"chat-{i}")) for i in range(args.chats)]
+    while not all(task.done() for task in tasks):
+        await asyncio.sleep(0.25)
+        samples.append((sum(task.done() for task in tasks), tracemalloc.get_traced_memory()[0], len(store)))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--think-time", type=float, default=0.02)
+    args = parser.parse_args()
+
+    spill_path = os.path.join(tempfile.mkdtemp(), "sessions.sqlite")
+    configs = {
+        "bounded": dict(max_sessions=args.concurrency, ttl=60, max_messages=40, spill_path=spill_path),
+        "unbounded": dict(max_sessions=10**9, ttl=10**9, max_messages=10**9),
+    }
+    for name, config in configs.items():
+        store = SessionStore(qa_agent, [scheduling_agent, feedback_agent], **config)
+        if name == "unbounded":
+            # What a single in-process history per chat costs when nothing is ever dropped.
+            store.aclose = lambda session_id: asyncio.sleep(0)
+        tracemalloc.start()
+        start = time.perf_counter()
+        samples = asyncio.run(run(store, args))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"== {name}: {args.chats} chats x {args.turns} turns, {args.concurrency} concurrent, {elapsed:.1f} s")
+        step = max(1, len(samples) // 8)
+        for finished, current, resident in samples[::step] + samples[-1:]:
+            print(f"  finished {finished:6d}  resident sessions {resident:6d}  traced {current / 1e6:8.1f} MB")
+        print(f"  peak traced {peak / 1e6:.1f} MB, stats {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Startup-time benchmark for the Chainlit app.
+
+Each run starts a fresh interpreter against the scripted OpenAI stand-in from mock_openai.py (zero latency,
+so only our own startup is measured) and reports, from interpreter start:
+- import: `import main`, the module Chainlit loads (chainlit.server, openai, numpy, tiktoken, the agents),
+- first_message: a booking request served end to end by `handle_message`; it needs no retrieval, so it must
+  not wait for the background index warm-up,
+- first_retrieval: a price question served by `handle_message`, which waits for the index.
+
+The index is always built in a scratch folder, never in the app's `.index_cache`. Warm runs share one folder
+that an uncounted run fills first; --cold gives every run an empty one.
+
+Run from assessment/llm_code:
+    python bench_startup.py --runs 5
+    python bench_startup.py --runs 5 --cold
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def answer_yes(question, timeout):
+    return "yes"
+
+
+def child(args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import agents
+        from langchain_openai import OpenAIEmbeddings
+
+        # Set before main starts the warm-up; the stand-in takes raw text, so skip the tiktoken pre-split.
+        agents.rag.index_folder = args.index_folder
+        agents.rag.embeddings = OpenAIEmbeddings(model=agents.rag.embedding_model, check_embedding_ctx_length=False)
+        import main
+    imported = time.perf_counter()
+
+    import asyncio
+    import chainlit as cl
+    from chainlit.context import init_http_context
+    import human_input
+
+    async def serve(content):
+        init_http_context()
+        human_input.handler.set(answer_yes)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await main.handle_message(cl.Message(content=content))
+        return time.perf_counter()
+
+    async def run():
+        first_message = await serve("I would like to book an appointment for a cleaning")
+        first_retrieval = await serve("What does a root canal cost?")
+        return first_message, first_retrieval
+
+    first_message, first_retrieval = asyncio.run(run())
+    print(json.dumps({
+        "import": imported - start,
+        "first_message": first_message - start,
+        "first_retrieval": first_retrieval - start,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="Use an empty index cache on every run.")
+    parser.add_argument("--base-url", help="Use an already running mock server instead of starting one")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--index-folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    base_url = args.base_url
+    if not base_url:
+        from mock_openai import serve_in_process
+
+        _, base_url = serve_in_process(latency=0.0, jitter=0.0)
+
+    # Everything the app persists goes to a scratch folder.
+    scratch = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="mock",
+        OPENAI_BASE_URL=base_url,
+        OPENAI_API_BASE=base_url,
+        APPOINTMENTS_DB=os.path.join(scratch, "appointments.sqlite"),
+        ESCALATIONS_DB=os.path.join(scratch, "escalations.sqlite"),
+        SESSION_SPILL_PATH=os.path.join(scratch, "sessions.sqlite"),
+    )
+
+    def run_child(index_folder):
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", "--index-folder", index_folder]
+        process = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if process.returncode != 0:
+            sys.exit(f"benchmark run failed (exit {process.returncode})\n{process.stderr.strip()[-2000:]}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    warm_folder = os.path.join(scratch, "warm_index")
+    if not args.cold:
+        run_child(warm_folder)
+    results = [
+        run_child(os.path.join(tempfile.mkdtemp(dir=scratch), "index") if args.cold else warm_folder)
+        for _ in range(args.runs)
+    ]
+
+    print(f"== {args.runs} runs, {'cold' if args.cold else 'warm'} index cache")
+    for key in ("import", "first_message", "first_retrieval"):
+        values = [result[key] * 1000 for result in results]
+        print(f"{key:>16}: median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import json
+import os
+import re
+import threading
+import time
+
+
+def normalize_query(query):
+    """Lowercase, drop punctuation and collapse whitespace so trivially different phrasings share a key."""
+    query = re.sub(r"[^\w\s]", " ", str(query).lower())
+    return " ".join(query.split())
+
+
+class LRUTTLCache:
+    def __init__(self, max_size=1024, ttl=3600, persist_path=None):
+        """
+        Bounded LRU cache whose entries also expire after `ttl` seconds.
+        :param max_size: Maximum number of entries kept; the least recently used entry is evicted first.
+        :param ttl: Time to live of an entry in seconds. None disables expiry.
+        :param persist_path: Optional JSON file the cache is loaded from and saved to.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if persist_path:
+            self.load()
+
+    def _expires_at(self):
+        # Wall-clock time so persisted entries keep their expiry across restarts.
+        return time.time() + self.ttl if self.ttl is not None else None
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._expires_at(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters used to size the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self):
+        """Load unexpired entries from `persist_path`, ignoring a missing or corrupt file."""
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, expires_at, value in stored[-self.max_size:]:
+                if expires_at is None or expires_at > now:
+                    self._entries[key] = (expires_at, value)
+
+    def save(self):
+        """Atomically write the entries, least recently used first, to `persist_path`."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            stored = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.persist_path)
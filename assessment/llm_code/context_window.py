@@ -0,0 +1,142 @@
+import asyncio
+import functools
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable offline
+    _encoding = None
+
+# Per-message framing tokens the chat format adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=8192)
+def count_text_tokens(text):
+    if not text:
+        return 0
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message):
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_text_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_text_tokens(tool_call["function"]["name"]) + count_text_tokens(tool_call["function"]["arguments"])
+    return tokens
+
+
+def split_turns(messages):
+    """Group messages into turns that each start at a user message, so tool calls stay with their results."""
+    turns = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class ContextWindow:
+    def __init__(self, max_tokens=6000, keep_recent_turns=3, summarize=None):
+        """
+        Keeps the prompt of every completion under a token budget.
+        :param max_tokens: Budget for the history sent with each completion, excluding the system prompt.
+        :param keep_recent_turns: Most recent turns that are always sent verbatim, even over budget.
+        :param summarize: Coroutine `(previous_summary, messages) -> summary` used to fold old turns.
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarize = summarize
+        # Turns left out of the most recent prompt; a gauge, since every build of a long session drops them again.
+        self.dropped_turns = 0
+        self.folded_turns = 0
+        self._pending = {}
+
+    def build(self, instructions, messages, summary=""):
+        """
+        Return the messages for one completion: the system prompt, the rolling summary and as many of
+        the most recent whole turns as fit into the budget.
+        """
+        prompt = [{"role": "system", "content": instructions}]
+        budget = self.max_tokens
+        if summary:
+            summary_message = {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+            prompt.append(summary_message)
+            budget -= count_message_tokens(summary_message)
+
+        turns = split_turns(messages)
+        kept = []
+        dropped = 0
+        for age, turn in enumerate(reversed(turns)):
+            cost = sum(count_message_tokens(message) for message in turn)
+            if age >= self.keep_recent_turns and cost > budget:
+                # Older turns not yet folded into the summary are left out rather than overflowing.
+                dropped = len(turns) - age
+                break
+            budget -= cost
+            kept.append(turn)
+        self.dropped_turns = dropped
+        for turn in reversed(kept):
+            prompt.extend(turn)
+        return prompt
+
+    def maybe_summarize(self, session):
+        """
+        Start folding the oldest turns of an over-budget session into its summary on a background task.
+        The current turn never waits for it; the next turn picks up the new summary when it is ready.
+        """
+        if self.summarize is None or session.id in self._pending:
+            return None
+        turns = split_turns(session.messages)
+        total = sum(count_message_tokens(message) for message in session.messages)
+        if total <= self.max_tokens or len(turns) <= self.keep_recent_turns:
+            return None
+
+        # Fold old turns until what remains is at most half the budget, leaving room to grow.
+        folded = []
+        for turn in turns[:-self.keep_recent_turns]:
+            if total <= self.max_tokens // 2:
+                break
+            folded.extend(turn)
+            total -= sum(count_message_tokens(message) for message in turn)
+        if not folded:
+            return None
+
+        task = asyncio.create_task(self._fold(session, folded))
+        self._pending[session.id] = task
+        task.add_done_callback(lambda _: self._pending.pop(session.id, None))
+        return task
+
+    async def _fold(self, session, folded):
+        try:
+            summary = await self.summarize(session.summary, folded)
+        except Exception as e:
+            print(f"Failed to summarize session {session.id}: {e}")
+            return
+        # Only apply the summary if the folded messages are still the head of the history.
+        head = session.messages[:len(folded)]
+        if len(head) == len(folded) and all(a is b for a, b in zip(head, folded)):
+            del session.messages[:len(folded)]
+            session.summary = summary
+            self.folded_turns += len(split_turns(folded))
+
+    def stats(self):
+        return {
+            "max_tokens": self.max_tokens,
+            "pending_summaries": len(self._pending),
+            "folded_turns": self.folded_turns,
+            "dropped_turns": self.dropped_turns,
+        }
+
+
+def format_transcript(messages):
+    """Render messages as plain text for the summarizer prompt."""
+    lines = []
+    for message in messages:
+        if message.get("content"):
+            lines.append(f"{message['role']}: {message['content']}")
+        for tool_call in message.get("tool_calls") or []:
+            lines.append(f"{message['role']} called {tool_call['function']['name']}({tool_call['function']['arguments']})")
+    return "\n".join(lines)
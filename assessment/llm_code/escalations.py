@@ -0,0 +1,205 @@
+from collections import deque
+from contextlib import closing
+import asyncio
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS escalations (
+    id INTEGER PRIMARY KEY,
+    summary TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    delivered_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS escalations_status ON escalations (status, available_at);
+"""
+
+
+async def print_report(escalation):
+    """Default delivery: print the report for the staff console, like the old escalate_to_human did."""
+    print("\n=== Escalation Report ===")
+    print(f"Ticket: #{escalation['id']}")
+    print(f"Summary: {escalation['summary']}")
+    print("=========================")
+
+
+class EscalationQueue:
+    def __init__(self, path, deliver=print_report, workers=2, max_attempts=5, retry_delay=5.0):
+        """
+        Persistent outbox for escalations to human staff, drained by a bounded pool of async workers.
+        Escalations survive restarts: anything not yet delivered is picked up again on the next start.
+        :param path: SQLite file backing the outbox.
+        :param deliver: Coroutine `(escalation dict) -> None` that hands an escalation to staff; raising retries it.
+        :param workers: Number of concurrent delivery workers.
+        :param max_attempts: Deliveries attempted before an escalation is marked failed.
+        :param retry_delay: Base delay in seconds before a retry; doubles with every attempt.
+        """
+        self.path = path
+        self.deliver = deliver
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._tasks = []
+        self._wakeup = None
+        self.latencies = deque(maxlen=1000)  # seconds from enqueue to delivery
+        # Rows per status as this process changed them, so the /metrics gauges never query SQLite on the event loop
+        self._counts = {"pending": 0, "in_progress": 0, "delivered": 0, "failed": 0}
+        self._counts_lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Deliveries interrupted by a crash or shutdown go back to the queue.
+            conn.execute("UPDATE escalations SET status = 'pending' WHERE status = 'in_progress'")
+            self._counts.update(conn.execute("SELECT status, COUNT(*) FROM escalations GROUP BY status").fetchall())
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _move(self, from_status, to_status):
+        """Update the in-memory counts after a committed status change (`from_status` None for a new row)."""
+        with self._counts_lock:
+            if from_status is not None:
+                self._counts[from_status] -= 1
+            self._counts[to_status] += 1
+
+    def _insert(self, summary):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            escalation_id = conn.execute(
+                "INSERT INTO escalations (summary, created_at, available_at) VALUES (?, ?, ?)", (summary, now, now)
+            ).lastrowid
+        self._move(None, "pending")
+        return escalation_id
+
+    async def enqueue(self, summary):
+        """Durably record an escalation and wake a worker. :return: The ticket id."""
+        escalation_id = await asyncio.to_thread(self._insert, summary)
+        self.start()
+        self._wakeup.set()
+        return escalation_id
+
+    def start(self):
+        """Start the worker pool on the running event loop, replacing any worker that has exited."""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _claim(self):
+        """Atomically take the oldest due escalation, or return None."""
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, summary, attempts, created_at FROM escalations "
+                "WHERE status = 'pending' AND available_at <= ? ORDER BY available_at LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE escalations SET status = 'in_progress', attempts = attempts + 1 WHERE id = ?", (row[0],))
+            conn.execute("COMMIT")
+        if row is None:
+            return None
+        self._move("pending", "in_progress")
+        return {"id": row[0], "summary": row[1], "attempts": row[2] + 1, "created_at": row[3]}
+
+    def _finish(self, escalation, error=None):
+        with closing(self._connect()) as conn, conn:
+            if error is None:
+                status = "delivered"
+                conn.execute("UPDATE escalations SET status = 'delivered', delivered_at = ? WHERE id = ?", (time.time(), escalation["id"]))
+            elif escalation["attempts"] >= self.max_attempts:
+                status = "failed"
+                conn.execute("UPDATE escalations SET status = 'failed', last_error = ? WHERE id = ?", (error, escalation["id"]))
+            else:
+                status = "pending"
+                retry_at = time.time() + self.retry_delay * 2 ** (escalation["attempts"] - 1)
+                conn.execute(
+                    "UPDATE escalations SET status = 'pending', available_at = ?, last_error = ? WHERE id = ?",
+                    (retry_at, error, escalation["id"]),
+                )
+        self._move("in_progress", status)
+
+    def _error_delay(self, errors):
+        return min(self.retry_delay * 2 ** min(errors, 10), 300.0)
+
+    async def _work(self):
+        errors = 0  # consecutive outbox errors, e.g. "database is locked"
+        while True:
+            try:
+                escalation = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                print(f"Escalation worker could not read the outbox: {e!r}")
+                await asyncio.sleep(self._error_delay(errors))
+                errors += 1
+                continue
+            errors = 0
+            if escalation is None:
+                # Sleep until something is enqueued, checking periodically for retries that became due.
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.retry_delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            error = None
+            try:
+                await self.deliver(escalation)
+            except Exception as e:
+                print(f"Escalation #{escalation['id']} delivery failed (attempt {escalation['attempts']}): {e}")
+                error = str(e)
+            await self._record(escalation, error)
+            if error is None:
+                self.latencies.append(time.time() - escalation["created_at"])
+
+    async def _record(self, escalation, error):
+        """Store the outcome of a delivery attempt, retrying until the outbox accepts it."""
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(self._finish, escalation, error)
+                return
+            except Exception as e:
+                print(f"Escalation #{escalation['id']}: could not record the delivery outcome: {e!r}")
+                await asyncio.sleep(self._error_delay(attempt))
+                attempt += 1
+
+    def stats(self):
+        """
+        Queue depth by status, read from the outbox (so it includes rows other processes added), and drain
+        latency (enqueue to delivery) over recent deliveries. Blocking; call it with asyncio.to_thread.
+        """
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM escalations GROUP BY status").fetchall())
+        return self._summary(counts)
+
+    def gauges(self):
+        """Same as `stats` from this process's in-memory counts; cheap enough for every /metrics scrape."""
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return self._summary(counts)
+
+    def _summary(self, counts):
+        latencies = sorted(self.latencies)
+        return {
+            "depth": counts.get("pending", 0) + counts.get("in_progress", 0),
+            "pending": counts.get("pending", 0),
+            "in_progress": counts.get("in_progress", 0),
+            "delivered": counts.get("delivered", 0),
+            "failed": counts.get("failed", 0),
+            "workers": sum(not task.done() for task in self._tasks),
+            "drain_latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "drain_latency_max": latencies[-1] if latencies else None,
+        }
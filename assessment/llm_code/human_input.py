@@ -0,0 +1,41 @@
+import contextvars
+import os
+
+# Seconds a tool waits for the user to answer in the chat before giving up.
+HUMAN_INPUT_TIMEOUT = int(os.getenv("HUMAN_INPUT_TIMEOUT", "300"))
+
+
+async def ask_in_chainlit(question, timeout):
+    """Ask the current Chainlit session; only this session's turn waits for the answer."""
+    import chainlit as cl
+
+    reply = await cl.AskUserMessage(content=question, timeout=timeout).send()
+    return reply["output"] if reply else None
+
+
+# Coroutine `(question, timeout) -> answer or None`. Scoped per context so tests or batch runs can answer
+# from a script without touching the Chainlit sessions served by the same process.
+handler = contextvars.ContextVar("human_input_handler", default=ask_in_chainlit)
+
+
+def interactive(tool):
+    """
+    Mark a tool that asks the user in the chat. Chainlit shows one question per session at a time, so
+    tools marked this way run one after another instead of concurrently with each other.
+    """
+    tool.interactive = True
+    return tool
+
+
+async def ask_user(question, timeout=None):
+    """
+    Ask the user of the current session a question and suspend until they answer.
+    :return: The answer text, or None if the user did not answer within the timeout.
+    """
+    return await handler.get()(question, timeout or HUMAN_INPUT_TIMEOUT)
+
+
+async def confirm(question, timeout=None):
+    """Ask a yes/no question; anything but a clear yes counts as no."""
+    answer = await ask_user(f"{question} (yes/no)", timeout)
+    return (answer or "").strip().lower() in {"y", "yes", "yeah", "yep", "sure", "confirm", "ok", "okay"}
@@ -0,0 +1,128 @@
+from collections import Counter
+import math
+import re
+
+from lexical import tokenize
+
+# Phrases that name an intent outright. A message hitting the rules of more than one intent is ambiguous.
+KEYWORDS = {
+    "scheduling": r"\b(book|booking|schedul\w*|reschedul\w*|appointments?|availab\w*|free slots?|slots?|cancel my)\b",
+    "feedback": r"\b(feedback|review|rate (you|the|my)|rating|suggestions?|my experience)\b",
+    "qa": r"\b(price|prices|cost|costs|how much|what is|what does|what are|symptoms?|pain|hurts?|bleed\w*|sensitiv\w*|prepar\w*|how long)\b",
+}
+
+# A few typical messages per intent for the TF-IDF centroids.
+EXAMPLES = {
+    "scheduling": [
+        "I want to book an appointment",
+        "Can I schedule a cleaning for next Tuesday",
+        "Do you have a free slot tomorrow morning",
+        "I need to reschedule my visit",
+        "Book me in with Dr. Turner on Friday at 10",
+        "When is the next available time for a root canal",
+        "Please make a reservation for teeth whitening next week",
+        "Is Monday afternoon free for a filling",
+    ],
+    "feedback": [
+        "I would like to leave some feedback",
+        "I want to rate my visit",
+        "Here is a review of your service",
+        "The staff was friendly and the visit went well",
+        "I have a suggestion to improve the clinic",
+        "My experience today was great",
+        "I was unhappy with the waiting time",
+    ],
+    "qa": [
+        "What does a root canal cost",
+        "How long does teeth whitening take",
+        "My tooth hurts when I drink something cold",
+        "What should I do before a cleaning",
+        "Which specialist does orthodontic consultations",
+        "My gums are bleeding when I brush",
+        "What is the difference between a filling and a crown",
+        "Do you treat sensitive teeth",
+        "How much is a dental check-up",
+    ],
+}
+
+
+class IntentRouter:
+    def __init__(self, agents, keywords=None, examples=None, threshold=0.3, margin=0.1, min_tokens=2):
+        """
+        Cheap in-process classifier that picks the agent for a user message before the first completion,
+        saving the completion that would otherwise only emit a `transfer_to_*` call.
+        Keyword rules decide when exactly one intent matches and TF-IDF does not point elsewhere; otherwise
+        the TF-IDF centroid must win by `margin` above `threshold`. Anything else is left to the agents' tools.
+        :param agents: Intent name -> Agent.
+        :param threshold: Minimum cosine similarity to an intent centroid.
+        :param margin: Minimum lead of the best intent over the runner-up.
+        :param min_tokens: Shorter messages ("yes", "ok") are never routed.
+        """
+        self.agents = agents
+        self.keywords = {intent: re.compile(pattern, re.I) for intent, pattern in (keywords or KEYWORDS).items() if intent in agents}
+        self.threshold = threshold
+        self.margin = margin
+        self.min_tokens = min_tokens
+
+        examples = {intent: texts for intent, texts in (examples or EXAMPLES).items() if intent in agents}
+        documents = [tokenize(text) for texts in examples.values() for text in texts]
+        document_frequency = Counter(term for tokens in documents for term in set(tokens))
+        self.idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self.centroids = {}
+        for intent, texts in examples.items():
+            centroid = Counter()
+            for text in texts:
+                for term, weight in self._vector(tokenize(text)).items():
+                    centroid[term] += weight / len(texts)
+            self.centroids[intent] = self._normalize(centroid)
+        self.counters = Counter()
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def _vector(self, tokens):
+        counts = Counter(token for token in tokens if token in self.idf)
+        return self._normalize({term: count * self.idf[term] for term, count in counts.items()})
+
+    def classify(self, text):
+        """:return: (intent or None when unsure, similarity scores by intent)."""
+        tokens = tokenize(text)
+        vector = self._vector(tokens)
+        scores = {
+            intent: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            for intent, centroid in self.centroids.items()
+        }
+        if len(tokens) < self.min_tokens:
+            return None, scores
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best, runner_up = scores[ranked[0]], scores[ranked[1]] if len(ranked) > 1 else 0.0
+        confident = best >= self.threshold and best - runner_up >= self.margin
+
+        matched = [intent for intent, pattern in self.keywords.items() if pattern.search(text)]
+        if len(matched) == 1 and (ranked[0] == matched[0] or not confident):
+            return matched[0], scores
+        if not matched and confident:
+            return ranked[0], scores
+        return None, scores
+
+    def route(self, text, current_agent):
+        """
+        :return: The agent to answer `text` if it should change, else None (stay, and let tools hand off).
+        """
+        intent, _ = self.classify(text)
+        if intent is None:
+            self.counters["unsure"] += 1
+            return None
+        agent = self.agents[intent]
+        if agent is current_agent:
+            self.counters["stayed"] += 1
+            return None
+        # Each direct switch replaces the completion that would only have called transfer_to_*.
+        self.counters["routed"] += 1
+        self.counters[f"routed_to_{intent}"] += 1
+        return agent
+
+    def stats(self):
+        return {"completions_saved": self.counters["routed"], **self.counters}
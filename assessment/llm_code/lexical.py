@@ -0,0 +1,78 @@
+from collections import Counter, defaultdict
+import math
+import re
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or the to what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords, with a naive plural strip ("fillings" -> "filling")."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", str(text).lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, texts, names=None, k1=1.5, b=0.75):
+        """
+        In-memory Okapi BM25 inverted index over a small document collection.
+        :param texts: Document texts; the position of a text is its document id.
+        :param names: Optional display names (e.g. service names) used for exact-name matching.
+        :param k1: BM25 term frequency saturation.
+        :param b: BM25 document length normalisation.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_id, term frequency)]
+        self.doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((doc_id, tf))
+        self.num_docs = len(self.doc_lengths)
+        self.avg_length = sum(self.doc_lengths) / self.num_docs if self.num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        self.name_tokens = [tuple(tokenize(name)) for name in (names or [])]
+
+    def search(self, query, k=None):
+        """Return `(doc_id, score)` pairs with a positive score, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k] if k is not None else ranked
+
+    def name_matches(self, query):
+        """Document ids whose full name appears as a contiguous token sequence in the query."""
+        query_tokens = tokenize(query)
+        matches = []
+        for doc_id, name in enumerate(self.name_tokens):
+            n = len(name)
+            if n and any(tuple(query_tokens[i:i + n]) == name for i in range(len(query_tokens) - n + 1)):
+                matches.append(doc_id)
+        return matches
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several rankings of document ids; `k` damps the weight of top ranks (Cormack et al.)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+
+import openai
+
+from context_window import count_message_tokens
+
+# Completion tokens reserved per request when the request does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        """
+        Async token bucket refilled continuously at `per_minute` units per minute, holding at most one minute's worth.
+        Waiters are served in arrival order.
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Take `amount` units, sleeping until they are available. :return: Seconds spent waiting."""
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+        return time.monotonic() - start
+
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) units once the real cost of a request is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LimitedClient:
+    def __init__(self, client, requests_per_minute=500, tokens_per_minute=200_000, max_concurrency=16,
+                 max_retries=5, timeout=60.0, base_delay=0.5, max_delay=20.0):
+        """
+        Shared chat-completions client that keeps all sessions inside the account's rate limits.
+        Every request waits for a request slot and its estimated tokens, then for a concurrency slot.
+        429, 5xx, timeouts and connection errors are retried with jittered exponential backoff.
+        :param client: AsyncOpenAI client; its own retries should be disabled (max_retries=0).
+        :param timeout: Per-request timeout in seconds.
+        """
+        self.client = client
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.counters = {"requests": 0, "retries": 0, "errors": 0, "queue_wait_seconds": 0.0, "backoff_seconds": 0.0}
+
+    @staticmethod
+    def estimate_tokens(request):
+        prompt = sum(count_message_tokens(message) for message in request["messages"])
+        return prompt + (request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _retryable(error):
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Full jitter spreads retries of concurrent sessions apart instead of sending them in lockstep
+        delay = random.uniform(0, delay)
+        return max(delay, retry_after or 0)
+
+    async def _admit(self, estimated_tokens, timings):
+        """Wait for rate-limit budget and a concurrency slot; the caller must release the semaphore."""
+        start = time.perf_counter()
+        await self.requests.acquire()
+        await self.tokens.acquire(estimated_tokens)
+        await self.semaphore.acquire()
+        waited = time.perf_counter() - start
+        self.in_flight += 1
+        self.counters["requests"] += 1
+        self.counters["queue_wait_seconds"] += waited
+        if timings is not None:
+            timings["queue_wait"] = timings.get("queue_wait", 0.0) + waited
+
+    def _release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    async def _retry_or_raise(self, attempt, error, timings):
+        if attempt >= self.max_retries or not self._retryable(error):
+            self.counters["errors"] += 1
+            raise error
+        delay = self._backoff(attempt, error)
+        print(f"OpenAI request failed ({type(error).__name__}), retrying in {delay:.2f}s")
+        self.counters["retries"] += 1
+        self.counters["backoff_seconds"] += delay
+        if timings is not None:
+            timings["retries"] = timings.get("retries", 0) + 1
+            timings["backoff"] = timings.get("backoff", 0.0) + delay
+        await asyncio.sleep(delay)
+
+    async def create(self, timings=None, **request):
+        """
+        chat.completions.create under the limits.
+        :param timings: Optional dict that accumulates `queue_wait`, `retries` and `backoff` seconds for the caller.
+        """
+        estimated = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(estimated, timings)
+            try:
+                response = await self.client.chat.completions.create(timeout=self.timeout, **request)
+            except Exception as e:
+                error = e
+            else:
+                if response.usage is not None:
+                    self.tokens.adjust(estimated - response.usage.total_tokens)
+                return response
+            finally:
+                self._release()
+            await self._retry_or_raise(attempt, error, timings)
+
+    async def stream(self, timings=None, **request):
+        """
+        Streaming chat.completions.create under the limits, yielding chunks.
+        The concurrency slot is held until the stream ends; only failures before the first chunk are retried,
+        so no partial output is ever repeated.
+        """
+        estimated = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await self._admit(estimated, timings)
+            started = False
+            try:
+                async for chunk in await self.client.chat.completions.create(stream=True, timeout=self.timeout, **request):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    self.counters["errors"] += 1
+                    raise
+                error = e
+            finally:
+                self._release()
+            await self._retry_or_raise(attempt, error, timings)
+
+    def stats(self):
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "request_budget": round(self.requests.tokens, 1),
+            "token_budget": round(self.tokens.tokens),
+        }
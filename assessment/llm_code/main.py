@@ -1,138 +1,544 @@
 from pydantic import BaseModel
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import atexit
+import contextvars
+import functools
+import hmac
 import json
 import inspect
 import os
+import time
 from dotenv import load_dotenv
-from agents import Agent, Response, qa_agent, scheduling_agent, feedback_agent
+from agents import Agent, Response, qa_agent, scheduling_agent, feedback_agent, rag, get_escalation_queue
+from sessions import SessionStore
+from tool_schemas import compile_tools
+from context_window import ContextWindow, count_message_tokens, format_transcript
+from response_cache import SemanticResponseCache
+from llm_client import LimitedClient
+from tracing import Tracer
+from intent_router import IntentRouter
+from model_tiers import completion_cost, model_for, validation_error
 import chainlit as cl
+from chainlit.server import app as chainlit_app
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 load_dotenv()
 cl.instrument_openai()
 api_key = os.getenv("OPENAI_API_KEY")
-client = AsyncOpenAI(api_key=api_key)
+client = AsyncOpenAI(api_key=api_key, max_retries=0)
 
-# Store messages and agent context globally for simplicity
-agent = qa_agent
-messages = []
+# All sessions share one limited client: request and token budgets per minute, a global concurrency cap,
+# jittered backoff on 429/5xx and per-request timeouts.
+llm = LimitedClient(
+    client,
+    requests_per_minute=int(os.getenv("OPENAI_RPM", "500")),
+    tokens_per_minute=int(os.getenv("OPENAI_TPM", "200000")),
+    max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+    timeout=float(os.getenv("OPENAI_TIMEOUT", "60")),
+)
 
-async def run_full_turn(agent, messages):
+# Stream assistant tokens to the UI as they arrive instead of waiting for the full completion.
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") == "1"
+
+# History sent with each completion is kept under a token budget; older turns are folded into a
+# rolling summary by a background task after the turn.
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+
+
+async def summarize_history(previous_summary, messages):
+    """Fold old turns into the running conversation summary."""
+    response = await llm.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "You maintain a running summary of a dental clinic support chat. "
+                    "Merge the previous summary with the new transcript. Keep every fact the assistant may need later: "
+                    "the patient's name, symptoms, services discussed, prices, dates, specialists and any booking or feedback given. "
+                    "Answer with the summary only, at most 150 words."
+                ),
+            },
+            {"role": "user", "content": f"Previous summary:\n{previous_summary or '(none)'}\n\nNew transcript:\n{format_transcript(messages)}"},
+        ],
+    )
+    return response.choices[0].message.content
+
+
+context_window = ContextWindow(
+    max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "6000")),
+    keep_recent_turns=int(os.getenv("CONTEXT_KEEP_TURNS", "3")),
+    summarize=summarize_history,
+)
+
+# Near-identical FAQ questions are answered from a semantic cache, scoped to agent and catalog version.
+response_cache = SemanticResponseCache(
+    embed=rag.aembed_query,
+    threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+) if os.getenv("RESPONSE_CACHE", "1") == "1" else None
+RESPONSE_CACHE_AGENTS = set(os.getenv("RESPONSE_CACHE_AGENTS", qa_agent.name).split(","))
+
+
+def drop_stale_answers(previous_key, changes):
+    """After a live catalog reload, forget cached answers written from the previous catalog version."""
+    if response_cache is not None and previous_key is not None and previous_key != rag.index_key:
+        response_cache.invalidate_where(lambda scope: scope[1] == previous_key)
+
+
+# With RAG_WATCH=1, edits to the catalog CSV are applied to the running app without a restart.
+if os.getenv("RAG_WATCH", "0") == "1":
+    rag.watch(interval=float(os.getenv("RAG_WATCH_DEBOUNCE", "1.0")), on_reload=drop_stale_answers)
+    atexit.register(rag.stop_watching)
+
+# Sync tools run on a bounded pool so they neither block the event loop nor each other.
+tool_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_WORKERS", "8")), thread_name_prefix="tool")
+
+# Warm the RAG index in the background so the app can accept connections immediately.
+rag.load_in_background()
+
+# Conversation state is scoped per Chainlit session; idle chats are evicted and spilled to SQLite.
+sessions = SessionStore(
+    default_agent=qa_agent,
+    agents=[scheduling_agent, feedback_agent],
+    max_sessions=int(os.getenv("SESSION_MAX_ACTIVE", "256")),
+    ttl=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+    max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "200")),
+    spill_path=os.getenv("SESSION_SPILL_PATH") or None,
+)
+
+# Clear-cut messages switch agent locally before the first completion instead of via a transfer_to_* round-trip;
+# anything ambiguous is left to the agents' handoff tools.
+intent_router = IntentRouter(
+    {"qa": qa_agent, "scheduling": scheduling_agent, "feedback": feedback_agent}
+) if os.getenv("INTENT_ROUTER", "1") == "1" else None
+
+# Every turn is traced as spans (turn, completion, tool, retrieval, handoff), aggregated into histograms served
+# at /metrics when METRICS_ENDPOINT=1 and, when TRACE_FILE is set, appended to a JSONL trace file.
+# The chat server is public, so set METRICS_TOKEN to require `Authorization: Bearer <token>` from scrapers.
+METRICS_ENDPOINT = os.getenv("METRICS_ENDPOINT", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+tracer = Tracer(trace_path=os.getenv("TRACE_FILE") or None)
+tracer.add_gauges("openai_client", llm.stats)
+tracer.add_gauges("sessions", sessions.stats)
+tracer.add_gauges("context_window", context_window.stats)
+tracer.add_gauges("retrieval_paths", lambda: dict(rag.retrieval_paths))
+tracer.add_gauges("escalations", lambda: get_escalation_queue().gauges())
+if response_cache is not None:
+    tracer.add_gauges("response_cache", response_cache.stats)
+if intent_router is not None:
+    tracer.add_gauges("intent_router", intent_router.stats)
+RETRIEVAL_TOOLS = {"aretrieve", "retrieve"}
+
+# Per-turn budgets. A turn that runs out ends with a partial answer instead of looping on.
+# TURN_MAX_ITERATIONS caps completions, including retries on another model tier.
+TURN_MAX_ITERATIONS = int(os.getenv("TURN_MAX_ITERATIONS", "8"))
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "90"))
+TURN_MAX_TOKENS = int(os.getenv("TURN_MAX_TOKENS", "40000"))
+TURN_MAX_HANDOFFS = int(os.getenv("TURN_MAX_HANDOFFS", "4"))
+
+
+# Yielded by run_full_turn after the last delta of every streamed completion, so each completion gets its
+# own chat message instead of running into the next one.
+END_OF_MESSAGE = object()
+
+
+def turn_limit_reached(completions, turn_start, tokens):
+    """:return: The budget a turn has used up before its next completion, or None."""
+    if completions >= TURN_MAX_ITERATIONS:
+        return "iterations"
+    if time.perf_counter() - turn_start >= TURN_DEADLINE_SECONDS:
+        return "deadline"
+    if tokens >= TURN_MAX_TOKENS:
+        return "tokens"
+    return None
+
+
+def partial_answer(messages, num_init_messages):
+    """Close a turn that hit a limit with whatever the agents already told the user."""
+    said = [m["content"] for m in messages[num_init_messages:] if m["role"] == "assistant" and m.get("content")]
+    answer = "I'm sorry, I couldn't finish this request in time."
+    if said:
+        answer += f" Here is what I have so far: {said[-1]}"
+    return answer + " Could you rephrase or ask something more specific?"
+
+
+async def metrics(request: Request):
+    """Prometheus scrape endpoint."""
+    if METRICS_TOKEN is not None:
+        supplied = request.headers.get("authorization", "").encode()
+        if not hmac.compare_digest(supplied, f"Bearer {METRICS_TOKEN}".encode()):
+            return PlainTextResponse("Unauthorized\n", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(tracer.render(), media_type="text/plain; version=0.0.4")
+
+if METRICS_ENDPOINT:
+    # Chainlit serves its UI from a catch-all route, so /metrics goes in front of it.
+    chainlit_app.router.routes.insert(0, APIRoute("/metrics", metrics, methods=["GET"]))
+
+
+async def run_full_turn(agent, messages, stream=False, summary=""):
+    """
+    Run one user turn until the current agent answers without tool calls.
+    Yields content deltas (str) while streaming, END_OF_MESSAGE after each streamed completion, then the final Response.
+    :param summary: Rolling summary of turns that are no longer in `messages`.
+    """
     current_agent = agent
     num_init_messages = len(messages)
     messages = messages.copy()
+    turn_start = time.perf_counter()
+    first_token_at = None
+    timings = {"queue_wait": 0.0, "retries": 0}
+    tiers = {}  # step tier -> completions, seconds and cost this turn
+    iteration = 0
+    completions = 0
+    tokens = 0
+    handoffs = []  # (from, to) agent names this turn
+    limit = None
 
-    while True:
-        # Turn Python functions into tools and save a reverse map
-        tool_schemas = [function_to_schema(tool) for tool in current_agent.tools]
-        tools = {tool.__name__: tool for tool in current_agent.tools}
-
-        # === 1. Get OpenAI completion ===
-        response = await client.chat.completions.create(
-            model=agent.model,
-            messages=[{"role": "system", "content": current_agent.instructions}]
-            + messages,
-            tools=tool_schemas or None,
-        )
-        message = response.choices[0].message
-        messages.append(message)
-
-        if message.content:  # Print agent response
-            print(f"{current_agent.name}:", message.content)
-
-        if not message.tool_calls:  # If finished handling tool calls, break
-            break
-
-        # === 2. Handle tool calls ===
-        for tool_call in message.tool_calls:
-            result = execute_tool_call(tool_call, tools, current_agent.name)
-
-            if type(result) is Agent:  # If agent transfer, update current agent
-                current_agent = result
-                result = (
-                    f"Transferred to {current_agent.name}. Adopt persona immediately."
-                )
-
-            result_message = {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": result,
-            }
-            messages.append(result_message)
+    with tracer.span("turn", agent=agent.name) as turn_span:
+        if intent_router is not None and messages and messages[-1]["role"] == "user":
+            routed = intent_router.route(messages[-1]["content"], current_agent)
+            if routed is not None:
+                tracer.record("handoff", 0.0, agent=current_agent.name, to=routed.name, tool="intent_router", iteration=0)
+                print(f"Routed to {routed.name} without a transfer completion")
+                handoffs.append((current_agent.name, routed.name))
+                current_agent = routed
 
-    # === 3. Return last agent used and new messages ===
-    yield Response(agent=current_agent, messages=messages[num_init_messages:])
+        while True:
+            limit = limit or turn_limit_reached(completions, turn_start, tokens)
+            if limit:
+                tracer.count("agent_turn_limits_total", reason=limit, agent=current_agent.name)
+                print(f"{current_agent.name}: turn stopped after {completions} completions ({limit} limit)")
+                answer = partial_answer(messages, num_init_messages)
+                messages.append({"role": "assistant", "content": answer})
+                if stream:
+                    yield answer
+                    yield END_OF_MESSAGE
+                break
+            iteration += 1
+            # Tool schemas, the reverse map and argument validators are compiled once per agent
+            tools = compile_tools(current_agent)
 
+            # === 1. Get OpenAI completion ===
+            request = dict(
+                messages=context_window.build(current_agent.instructions, messages, summary),
+                tools=tools.schemas or None,
+            )
+            # The first call of a turn usually only picks a tool or handoff, so it may use a cheaper tier. If that
+            # tier answers instead, the answer tier rewrites the reply; output that fails validation is retried
+            # once on the escalation tier.
+            step = "routing" if tools.schemas and messages[-1]["role"] == "user" else "answer"
+            while True:
+                model = model_for(current_agent, step)
+                # Only stream a reply we will keep: a routing-tier answer may still be replaced
+                stream_step = stream and (step != "routing" or model == model_for(current_agent, "answer"))
+                streamed = False
+                step_start = time.perf_counter()
+                with tracer.span("completion", agent=current_agent.name, model=model, tier=step, iteration=iteration) as span:
+                    async for item in complete_step(dict(request, model=model), stream_step, timings):
+                        if isinstance(item, str):
+                            streamed = True
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            yield item
+                        else:
+                            message, usage = item
+                    if not stream_step and message.content and first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    span["tool_calls"] = len(message.tool_calls or [])
+                    if usage is not None:
+                        span["prompt_tokens"], span["completion_tokens"] = usage.prompt_tokens, usage.completion_tokens
+                    else:
+                        # The endpoint did not report usage; count locally with the context window's tokenizer
+                        span["prompt_tokens"] = sum(count_message_tokens(m) for m in request["messages"])
+                        span["completion_tokens"] = count_message_tokens(message_to_dict(message))
+                        span["tokens_estimated"] = True
+                    span["cost_usd"] = completion_cost(model, span["prompt_tokens"], span["completion_tokens"])
+                    tokens += span["prompt_tokens"] + span["completion_tokens"]
+                    completions += 1
 
-def execute_tool_call(tool_call, tools, agent_name):
-    """Executes the corresponding tool function with its arguments."""
-    name = tool_call.function.name
-    args = json.loads(tool_call.function.arguments)
+                    next_step = None
+                    error = validation_error(message, tools)
+                    if step == "routing" and not message.tool_calls and model != model_for(current_agent, "answer"):
+                        next_step = "answer"
+                    elif error and not streamed and step != "escalation" and model != model_for(current_agent, "escalation"):
+                        print(f"{current_agent.name}: {model} output rejected ({error}); retrying on the escalation tier")
+                        next_step = "escalation"
+                    # A retry is another completion, so it has to fit the turn's budgets too
+                    retry_limit = next_step and turn_limit_reached(completions, turn_start, tokens)
+                    if retry_limit and next_step == "answer" and not error:
+                        print(f"{current_agent.name}: keeping the {model} answer ({retry_limit} limit)")
+                        next_step = None
+                    elif retry_limit:
+                        # Unusable output and no budget left to retry it: end the turn with a partial answer
+                        limit = retry_limit
+                    span["discarded"] = next_step is not None
 
-    print(f"{agent_name}: {name}({args})")
+                if streamed:
+                    yield END_OF_MESSAGE
+                tier = tiers.setdefault(step, {"completions": 0, "seconds": 0.0, "cost_usd": 0.0})
+                tier["completions"] += 1
+                tier["seconds"] += time.perf_counter() - step_start
+                tier["cost_usd"] += span["cost_usd"] or 0.0
+                if next_step is None or limit:
+                    break
+                step = next_step
+            if limit:
+                continue
+            messages.append(message_to_dict(message))
+
+            if message.content:  # Print agent response
+                print(f"{current_agent.name}:", message.content)
+
+            if not message.tool_calls:  # If finished handling tool calls, break
+                break
+
+            # === 2. Handle tool calls ===
+            # Run the calls of this response concurrently, except that tools asking the user take turns (the chat
+            # shows one question at a time); then apply results in the order the model asked for them
+            tools_start = time.perf_counter()
+            asks_user = [tool_call.function.name in tools.interactive for tool_call in message.tool_calls]
 
-    return tools[name](**args)
+            async def ask_in_order():
+                return [
+                    await execute_tool_call(tool_call, tools, current_agent.name, iteration)
+                    for tool_call, asks in zip(message.tool_calls, asks_user) if asks
+                ]
 
+            concurrent, asked = await asyncio.gather(
+                asyncio.gather(*(
+                    execute_tool_call(tool_call, tools, current_agent.name, iteration)
+                    for tool_call, asks in zip(message.tool_calls, asks_user) if not asks
+                )),
+                ask_in_order(),
+            )
+            concurrent, asked = iter(concurrent), iter(asked)
+            results = [next(asked) if asks else next(concurrent) for asks in asks_user]
+            for tool_call, result in zip(message.tool_calls, results):
+                if type(result) is Agent and (
+                    (current_agent.name, result.name) in handoffs or len(handoffs) >= TURN_MAX_HANDOFFS
+                ):
+                    # The same transfer twice in one turn is agents ping-ponging; make the current one answer.
+                    tracer.count("agent_turn_limits_total", reason="handoff_cycle", agent=current_agent.name)
+                    print(f"{current_agent.name}: refused transfer to {result.name} (handoffs so far: {handoffs})")
+                    result = (
+                        f"Transfer to {result.name} refused: this turn was already handed over too often. "
+                        "Answer the user yourself with what you know."
+                    )
+                elif type(result) is Agent:  # If agent transfer, update current agent
+                    handoffs.append((current_agent.name, result.name))
+                    tracer.record("handoff", time.perf_counter() - tools_start, agent=current_agent.name,
+                                  to=result.name, tool=tool_call.function.name, iteration=iteration)
+                    current_agent = result
+                    result = (
+                        f"Transferred to {current_agent.name}. Adopt persona immediately."
+                    )
 
-def function_to_schema(func):
-    """Converts Python functions into LangChain tool schema."""
-    type_map = {
-        str: "string",
-        int: "integer",
-        float: "number",
-        bool: "boolean",
-        list: "array",
-        dict: "object",
-        type(None): "null",
+                result_message = {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": result if isinstance(result, str) else json.dumps(result, default=str),
+                }
+                messages.append(result_message)
+
+        turn_span.update(iterations=iteration, final_agent=current_agent.name, queue_wait=timings["queue_wait"], limit=limit)
+
+    # Queue wait is time spent waiting on our own rate limits, as opposed to model latency
+    metrics = {
+        "turn_seconds": time.perf_counter() - turn_start,
+        "iterations": iteration,
+        "completions": completions,
+        "cost_usd": sum(tier["cost_usd"] for tier in tiers.values()),
+        "tiers": tiers,
+        "tokens": tokens,
+        "handoffs": len(handoffs),
+        "agent_path": [agent.name] + [to for _, to in handoffs],
+        "limit": limit,
+        **timings,
     }
+    if first_token_at is not None:
+        metrics["time_to_first_token"] = first_token_at - turn_start
+        print(f"Time to first token: {metrics['time_to_first_token']:.3f}s")
+    if timings["queue_wait"] >= 0.05 or timings["retries"]:
+        print(f"Rate-limit queue wait: {timings['queue_wait']:.3f}s, retries: {timings['retries']}, client: {llm.stats()}")
+
+    # === 3. Return last agent used and new messages ===
+    yield Response(agent=current_agent, messages=messages[num_init_messages:], metrics=metrics)
+
+
+async def complete_step(request, stream, timings):
+    """One completion: yields content deltas when streaming, then `(message, usage)`."""
+    if stream:
+        async for chunk in stream_completion(timings, **request):
+            if isinstance(chunk, str):
+                yield chunk
+            else:
+                message = chunk
+        yield message, timings.pop("usage", None)
+    else:
+        response = await llm.create(timings, **request)
+        yield response.choices[0].message, response.usage
+
+
+async def stream_completion(timings=None, **request):
+    """
+    Stream a chat completion, yielding content deltas as they arrive and finally the assembled
+    ChatCompletionMessage. Tool-call fragments are merged by their index as they stream in.
+    """
+    content = []
+    tool_calls = {}
+    async for chunk in llm.stream(timings, stream_options={"include_usage": True}, **request):
+        if chunk.usage is not None and timings is not None:
+            timings["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield delta.content
+        for fragment in delta.tool_calls or []:
+            call = tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function:
+                call["name"] += fragment.function.name or ""
+                call["arguments"] += fragment.function.arguments or ""
+
+    yield ChatCompletionMessage(
+        role="assistant",
+        content="".join(content) or None,
+        tool_calls=[
+            ChatCompletionMessageToolCall(
+                id=call["id"],
+                type="function",
+                function=Function(name=call["name"], arguments=call["arguments"]),
+            )
+            for _, call in sorted(tool_calls.items())
+        ] or None,
+    )
+
+
+def message_to_dict(message):
+    """Convert an assistant completion message into a plain, JSON-serialisable chat message."""
+    result = {"role": message.role, "content": message.content}
+    if message.tool_calls:
+        result["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+            }
+            for tool_call in message.tool_calls
+        ]
+    return result
 
+
+async def execute_tool_call(tool_call, tools, agent_name, iteration=None):
+    """Executes the corresponding tool function with its validated arguments.
+    Coroutine tools are awaited on the event loop; sync tools run on `tool_executor`.
+    Unusable calls and tools that fail return an error message for the model instead of raising."""
+    name = tool_call.function.name
+    args, error = tools.parse_arguments(name, tool_call.function.arguments)
+    if error:
+        print(f"{agent_name}: {name} rejected: {error}")
+        return error
+
+    print(f"{agent_name}: {name}({args})")
+
+    tool = tools.functions[name]
+    kind = "retrieval" if name in RETRIEVAL_TOOLS else "tool"
     try:
-        signature = inspect.signature(func)
-    except ValueError as e:
-        raise ValueError(f"Failed to get signature for function {func.__name__}: {str(e)}")
-
-    parameters = {}
-    for param in signature.parameters.values():
-        param_type = type_map.get(param.annotation, "string")
-        parameters[param.name] = {"type": param_type}
-
-    required = [
-        param.name for param in signature.parameters.values()
-        if param.default == inspect._empty
-    ]
-
-    return {
-        "type": "function",
-        "function": {
-            "name": func.__name__,
-            "description": (func.__doc__ or "").strip(),
-            "parameters": {
-                "type": "object",
-                "properties": parameters,
-                "required": required,
-            },
-        },
-    }
+        with tracer.span(kind, agent=agent_name, tool=name, iteration=iteration):
+            if inspect.iscoroutinefunction(tool):
+                return await tool(**args)
+            # Copy the context so Chainlit's per-session context is visible inside the worker thread
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, tool, **args)
+            result = await asyncio.get_running_loop().run_in_executor(tool_executor, call)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+    except Exception as e:
+        # One failing tool must not take down the other calls of the turn gathered with it
+        print(f"{agent_name}: {name} failed: {e!r}")
+        return f"Error: {name} failed ({type(e).__name__}). Tell the user it is temporarily unavailable or try another way."
 
 @cl.on_message
 async def handle_message(message: cl.Message):
     """Chainlit message handler."""
-    global agent, messages
+    session = await sessions.aget(cl.context.session.id)
 
     # Append user message to conversation
-    messages.append({"role": "user", "content": message.content})
+    session.messages.append({"role": "user", "content": message.content})
+    start_agent = session.agent
+
+    # Answer repeated questions from the semantic cache without calling OpenAI. Only a chat's opening question
+    # qualifies: later answers are written with the patient's earlier turns in the prompt, so they may carry
+    # personal details or only make sense as a follow-up ("what about for kids?").
+    scope = (start_agent.name, rag.index_key)
+    query_vector = None
+    opening_question = len(session.messages) == 1 and not session.summary
+    if response_cache is not None and opening_question and start_agent.name in RESPONSE_CACHE_AGENTS and rag.index_key is not None:
+        try:
+            cached_answer, query_vector = await response_cache.lookup(scope, message.content)
+        except Exception as e:
+            print(f"Response cache lookup failed: {e}")
+            cached_answer = None
+        if cached_answer is not None:
+            print("Response cache hit:", response_cache.stats())
+            await cl.Message(content=cached_answer).send()
+            session.messages.append({"role": "assistant", "content": cached_answer})
+            await sessions.asave(session)
+            return
 
     # Run the interaction
-    async for response in run_full_turn(agent, messages):
+    reply = None
+    shown = None  # text of the last streamed message
+    async for response in run_full_turn(session.agent, session.messages, stream=STREAM_RESPONSES, summary=session.summary):
+        if response is END_OF_MESSAGE:
+            if reply is not None:
+                await reply.send()
+                shown, reply = reply.content, None
+            continue
+        if isinstance(response, str):
+            # Streamed content delta
+            if reply is None:
+                reply = cl.Message(content="")
+            await reply.stream_token(response)
+            continue
+
         print(response)
         # At this point, `response` is a Response object
         # Access the content directly from the response object
-        final_response = response.messages[-1].content
-        await cl.Message(content=f"{final_response}").send()
-
-    # Update the global agent if transitioned
-    agent_context = agent.name
-    if agent_context == "Feedback Agent":
-        # Explicitly collect feedback via the feedback agent
-        feedback_result = feedback_agent.tools[0]()  # `collect_human_feedback`
-        await cl.Message(content=f"Feedback collected: {feedback_result}").send()
+        final_response = response.messages[-1]["content"]
+        if final_response != shown:
+            await cl.Message(content=f"{final_response}").send()
+
+        # Keep the agent the turn ended with and the new messages for the next turn
+        session.agent = response.agent
+        session.messages.extend(response.messages)
+
+        if query_vector is not None and response.agent is start_agent and response_cache.cacheable(response.messages):
+            response_cache.store(scope, query_vector, response.messages[-1]["content"], response.metrics["turn_seconds"])
+    await sessions.asave(session)
+    context_window.maybe_summarize(session)
+
+
+@cl.on_chat_start
+async def start_chat():
+    # Drain escalations left in the outbox by earlier runs; a no-op once the workers are running
+    get_escalation_queue().start()
+
+
+@cl.on_chat_end
+async def end_chat():
+    await sessions.aclose(cl.context.session.id)
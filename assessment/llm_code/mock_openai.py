@@ -0,0 +1,270 @@
+"""
+Local stand-in for the OpenAI chat-completions and embeddings endpoints, for offline load tests.
+
+Replies follow a small script instead of a model: the last user message is matched against rules that
+each name a tool call (handoffs like `transfer_to_scheduling_agent`, `aretrieve`, `execute_scheduling`, ...).
+The first rule whose tool the agent offers, and which has not been called yet in this turn, is answered
+with that tool call; once nothing applies the reply is a plain answer built from the last tool result.
+Embeddings are deterministic hashed bags of words, so identical texts embed identically and similar
+texts land close together.
+
+Run from assessment/llm_code and point the app at it:
+    python mock_openai.py --port 8765 --latency 0.4 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_BASE=http://127.0.0.1:8765/v1 chainlit run main.py
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DEFAULT_SCRIPT = [
+    {"pattern": r"book|appointment|schedule", "tool": "transfer_to_scheduling_agent", "arguments": {}},
+    {"pattern": r"free|available|slot", "tool": "find_free_slots", "arguments": {"service": "Teeth Cleaning"}},
+    {"pattern": r"book|appointment|schedule", "tool": "execute_scheduling",
+     "arguments": {"date": "{slot}", "event_type": "Teeth Cleaning", "reason": "check-up", "patient_name": "Load Test"}},
+    {"pattern": r"feedback|thank", "tool": "transfer_to_feedback_agent", "arguments": {}},
+    {"pattern": r"price|cost|how|what|question", "tool": "transfer_back_to_qa", "arguments": {}},
+    {"pattern": r"human|manager|complain", "tool": "escalate_to_human", "arguments": {"summary": "{query}"}},
+    {"pattern": r".", "tool": "aretrieve", "arguments": {"query": "{query}"}},
+    {"pattern": r".", "tool": "retrieve", "arguments": {"query": "{query}"}},
+]
+
+WORD = re.compile(r"\w+")
+
+
+def embed_text(text, dimensions):
+    """Hashed bag of words (or of token ids), L2-normalised."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    tokens = [str(token) for token in text] if isinstance(text, list) else WORD.findall(text.lower())
+    for token in tokens:
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if value >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return vector / norm
+
+
+def random_slot():
+    """A quarter-hour start within clinic hours on a weekday in the next few weeks."""
+    day = datetime.now().date() + timedelta(days=random.randint(1, 40))
+    while day.weekday() == 6:
+        day += timedelta(days=1)
+    return f"{day:%Y-%m-%d} {random.randint(8, 16):02d}:{random.choice([0, 15, 30, 45]):02d}"
+
+
+class ScriptedModel:
+    def __init__(self, script=None, latency=0.3, jitter=0.2, token_delay=0.0, rate_limit_rate=0.0, dimensions=1536):
+        """
+        :param script: Rules `{"pattern", "tool", "arguments"}`; argument strings may use {query} and {slot}.
+        :param latency: Mean seconds before the first token (or the whole answer when not streaming).
+        :param jitter: Latency varies uniformly by this fraction either way.
+        :param token_delay: Seconds between streamed chunks.
+        :param rate_limit_rate: Fraction of requests answered with 429, to exercise client backoff.
+        """
+        self.script = [dict(rule, regex=re.compile(rule["pattern"], re.I)) for rule in (script or DEFAULT_SCRIPT)]
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.rate_limit_rate = rate_limit_rate
+        self.dimensions = dimensions
+        self.counters = {"completions": 0, "tool_calls": 0, "embeddings": 0, "rate_limited": 0}
+
+    async def wait(self, scale=1.0):
+        delay = self.latency * scale * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def rate_limited(self):
+        if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+            self.counters["rate_limited"] += 1
+            return True
+        return False
+
+    def reply(self, request):
+        """:return: (content, tool_calls) for a chat request."""
+        messages = request["messages"]
+        offered = {tool["function"]["name"] for tool in request.get("tools") or []}
+        last_user = max((i for i, message in enumerate(messages) if message["role"] == "user"), default=-1)
+        query = messages[last_user]["content"] if last_user >= 0 else ""
+        called = {
+            tool_call["function"]["name"]
+            for message in messages[last_user + 1:]
+            for tool_call in message.get("tool_calls") or []
+        }
+        for rule in self.script:
+            if rule["tool"] in offered and rule["tool"] not in called and rule["regex"].search(query):
+                arguments = {
+                    key: value.format(query=query, slot=random_slot()) if isinstance(value, str) else value
+                    for key, value in rule["arguments"].items()
+                }
+                call = {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                        "function": {"name": rule["tool"], "arguments": json.dumps(arguments)}}
+                return None, [call]
+
+        last = messages[-1] if messages else {}
+        if last.get("role") == "tool":
+            return f"Here is what I found: {str(last.get('content'))[:300]}", None
+        return f"Thanks for your message. You asked: {query[:200]}", None
+
+    def completion(self, request):
+        content, tool_calls = self.reply(request)
+        self.counters["completions"] += 1
+        self.counters["tool_calls"] += len(tool_calls or [])
+        prompt_tokens = sum(len(str(message.get("content") or "")) // 4 + 4 for message in request["messages"])
+        completion_tokens = len(content or json.dumps(tool_calls)) // 4 + 1
+        return content, tool_calls, {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+
+def build_app(model):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+
+    def rate_limit_response():
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429, headers={"retry-after": "0.2"},
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if model.rate_limited():
+            return rate_limit_response()
+        await model.wait()
+        content, tool_calls, usage = model.completion(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        name = body.get("model", "mock")
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": name,
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta, finish_reason=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": name,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            if tool_calls:
+                for index, call in enumerate(tool_calls):
+                    yield chunk({"tool_calls": [dict(call, index=index)]})
+            else:
+                for word in re.findall(r"\S+\s*", content):
+                    if model.token_delay:
+                        await asyncio.sleep(model.token_delay)
+                    yield chunk({"content": word})
+            yield chunk({}, "tool_calls" if tool_calls else "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': name, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        if model.rate_limited():
+            return rate_limit_response()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await model.wait(scale=0.25)
+        model.counters["embeddings"] += len(inputs)
+        dimensions = body.get("dimensions") or model.dimensions
+        data = []
+        for index, text in enumerate(inputs):
+            vector = embed_text(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                vector = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(len(text) if isinstance(text, list) else len(text) // 4 + 1 for text in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "mock"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.get("/v1/stats")
+    async def stats():
+        return model.counters
+
+    return app
+
+
+def _serve(model_kwargs, host, port):
+    import uvicorn
+
+    uvicorn.run(build_app(ScriptedModel(**model_kwargs)), host=host, port=port, log_level="warning", access_log=False)
+
+
+def serve_in_process(host="127.0.0.1", **model_kwargs):
+    """
+    Start the mock server in a child process, so it does not compete with the app under test for the GIL.
+    :return: (process, base_url) once it answers requests.
+    """
+    import multiprocessing
+    import socket
+    import urllib.request
+
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(model_kwargs, host, port), daemon=True)
+    process.start()
+    base_url = f"http://{host}:{port}/v1"
+    while True:
+        try:
+            urllib.request.urlopen(f"{base_url}/stats").close()
+            return process, base_url
+        except OSError:
+            if not process.is_alive():
+                raise RuntimeError("mock OpenAI server failed to start")
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--script", help="JSON file with a list of {pattern, tool, arguments} rules")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    model = ScriptedModel(script, args.latency, args.jitter, args.token_delay, args.rate_limit_rate)
+    uvicorn.run(build_app(model), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
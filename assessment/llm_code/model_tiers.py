@@ -0,0 +1,50 @@
+import os
+
+# Model tiers. Agents map loop steps to these in `Agent.models`; set the env vars to swap models per deployment.
+CHEAP_MODEL = os.getenv("MODEL_CHEAP", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("MODEL_STRONG", "gpt-4o")
+
+# USD per 1M (prompt, completion) tokens, for cost accounting only.
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+# Loop steps a completion can be made for:
+# - routing: the first call of a turn, which usually only picks a tool or a handoff,
+# - answer: a call that is expected to write the reply, e.g. after tool results,
+# - escalation: a retry after the output failed validation.
+STEPS = ("routing", "answer", "escalation")
+
+
+def model_for(agent, step):
+    """The model `agent` uses for a loop step; steps without a policy use `agent.model`."""
+    return agent.models.get(step) or agent.model
+
+
+def completion_cost(model, prompt_tokens, completion_tokens):
+    """:return: Cost in USD, or None for models without a known price."""
+    price = PRICES.get(model)
+    if price is None:
+        # Dated snapshots ("gpt-4o-2024-08-06") are priced like their base model.
+        price = next((PRICES[base] for base in sorted(PRICES, key=len, reverse=True) if model.startswith(base + "-")), None)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def validation_error(message, tools):
+    """
+    Check a completion before acting on it.
+    :return: Why the output is unusable (empty reply, unknown tool, bad arguments), or None when it is fine.
+    """
+    if not message.content and not message.tool_calls:
+        return "empty reply"
+    for tool_call in message.tool_calls or []:
+        _, error = tools.parse_arguments(tool_call.function.name, tool_call.function.arguments)
+        if error:
+            return error
+    return None
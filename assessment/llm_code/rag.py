@@ -1,39 +1,314 @@
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from langchain.schema import Document
-import pandas as pd
+# langchain, FAISS and pandas are imported inside the methods that need them so that importing
+# this module (and agents.py) stays cheap; the index is built later, usually on a background thread.
+from cache import LRUTTLCache, normalize_query
+from lexical import BM25Index, reciprocal_rank_fusion
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import atexit
+import hashlib
+import json
 import os
+import shutil
+import threading
 
 class DentalServiceRAG:
-    def __init__(self, data_folder="../data", filename="dental_clinic_data.csv", embedding_model="text-embedding-ada-002"):
+    # A lexical hit is trusted without embedding when it scores at least this much...
+    LEXICAL_MIN_SCORE = 1.2
+    # ...and beats the runner-up by this factor.
+    LEXICAL_MARGIN = 3.0
+    # Candidates taken from each ranking before reciprocal-rank fusion.
+    FUSION_DEPTH = 20
+
+    def __init__(self, data_folder="../data", filename="dental_clinic_data.csv", embedding_model="text-embedding-ada-002", index_folder=None, embeddings=None, cache_size=1024, cache_ttl=3600, persist_cache=False):
         """
         Initialize the RAG system for the dental service dataset.
         :param data_folder: Relative folder where the dataset is located.
         :param filename: Name of the dataset file.
         :param embedding_model: The embedding model to use.
+        :param index_folder: Folder where the FAISS index is cached. Defaults to `.index_cache` next to the dataset.
+        :param embeddings: Optional embeddings instance. Defaults to OpenAIEmbeddings for `embedding_model`.
+        :param cache_size: Maximum number of cached query embeddings and retrieval results.
+        :param cache_ttl: Seconds a cached query embedding or retrieval result stays valid.
+        :param persist_cache: Save the caches in `index_folder` on exit and reload them on start.
         """
         self.data_folder = data_folder
         self.filename = filename
         self.dataset_path = os.path.abspath(os.path.join(data_folder, filename))
         self.embedding_model = embedding_model
+        self.index_folder = os.path.abspath(index_folder or os.path.join(data_folder, ".index_cache"))
+        self.embeddings = embeddings
         self.vector_store = None
+        self.index_key = None
+        self.services = None
+        self.appointments = None
+        self.documents = []
+        self.lexical_index = None
+        self._doc_ids = {}
+        self.fingerprints = {}
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._load_future = None
+        self._load_future_lock = threading.Lock()
+        self.retrieval_paths = Counter()
+        self.embedding_cache = LRUTTLCache(cache_size, cache_ttl, self._cache_path("query_embeddings.json") if persist_cache else None)
+        self.result_cache = LRUTTLCache(cache_size, cache_ttl, self._cache_path("retrieval_results.json") if persist_cache else None)
+        if persist_cache:
+            atexit.register(self.save_caches)
+
+    def _cache_path(self, name):
+        return os.path.join(f"{self.index_folder}_query_cache", name)
+
+    def save_caches(self):
+        self.embedding_cache.save()
+        self.result_cache.save()
+
+    def cache_stats(self):
+        """Hit/miss counters of the query embedding and retrieval result caches."""
+        return {"embeddings": self.embedding_cache.stats(), "results": self.result_cache.stats()}
+
+    def _get_embeddings(self):
+        if self.embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            self.embeddings = OpenAIEmbeddings(model=self.embedding_model)
+        return self.embeddings
+
+    def _embedder_identity(self):
+        """Which embedder produces the vectors: its class, model, output size and endpoint."""
+        embeddings = self._get_embeddings()
+        parts = [f"{type(embeddings).__module__}.{type(embeddings).__qualname__}"]
+        for attribute in ("model", "model_name", "dimensions", "size", "openai_api_base"):
+            value = getattr(embeddings, attribute, None)
+            if value is not None:
+                parts.append(f"{attribute}={value}")
+        return "|".join(parts)
+
+    def _compute_index_key(self, texts):
+        """Hash the indexed document texts together with the embedder identity."""
+        digest = hashlib.sha256()
+        digest.update(self._embedder_identity().encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0")
+            digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _fingerprint(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _manifest_path(self):
+        return os.path.join(self.index_folder, "manifest.json")
+
+    def _load_cached_index(self):
+        """Return the cached FAISS store and its per-document fingerprints, or (None, {})."""
+        from langchain_community.vectorstores import FAISS
+
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+        # Vectors from another embedder (or a fake one) would load fine and silently return wrong neighbours.
+        embedder = self._embedder_identity()
+        if manifest.get("embedder") != embedder or "fingerprints" not in manifest:
+            print(f"Cached index was built by {manifest.get('embedder') or manifest.get('embedding_model')!r}, not {embedder!r}; rebuilding")
+            return None, {}
+        try:
+            # The docstore is pickled by FAISS.save_local; we only load files we wrote ourselves.
+            store = FAISS.load_local(self.index_folder, self._get_embeddings(), allow_dangerous_deserialization=True)
+        except Exception as e:
+            print(f"Failed to load cached index, rebuilding: {e}")
+            return None, {}
+        expected = getattr(self.embeddings, "dimensions", None) or getattr(self.embeddings, "size", None)
+        if store.index.d != manifest.get("dimension") or (expected and store.index.d != expected):
+            print(f"Cached index has {store.index.d}-dimensional vectors, manifest says {manifest.get('dimension')} "
+                  f"and the embedder {expected or 'does not say'}; rebuilding")
+            return None, {}
+        return store, manifest["fingerprints"]
+
+    def _save_index(self, index_key):
+        """Write the index to a temporary folder and swap it in so readers never see a partial cache."""
+        tmp_folder = f"{self.index_folder}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        with self._lock:
+            self.vector_store.save_local(tmp_folder)
+        manifest = {
+            "index_key": index_key,
+            "embedding_model": self.embedding_model,
+            "embedder": self._embedder_identity(),
+            "dimension": self.vector_store.index.d,
+            "dataset": self.filename,
+            "fingerprints": self.fingerprints,
+        }
+        with open(os.path.join(tmp_folder, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        shutil.rmtree(self.index_folder, ignore_errors=True)
+        os.replace(tmp_folder, self.index_folder)
+
+    def _split_catalog(self, data):
+        """Split the raw CSV rows by `Type` into the service catalog and the appointment store."""
+        import pandas as pd
+
+        services = data.loc[data["Type"] == "Service", ["Service Name", "Description", "Price", "Specialist", "Preparation", "Duration (mins)"]]
+        services = services.drop_duplicates(subset="Service Name", keep="last").reset_index(drop=True)
+
+        appointments = data.loc[data["Type"] == "Appointment", ["Service Name", "Specialist", "Patient Name", "Appointment Date"]].copy()
+        appointments["Appointment Date"] = pd.to_datetime(appointments["Appointment Date"], errors="coerce")
+        appointments = appointments.dropna(subset=["Appointment Date"])
+        appointments = appointments.sort_values(["Specialist", "Appointment Date"]).reset_index(drop=True)
+        return services, appointments
+
+    def read_tables(self):
+        """
+        Read the CSV into the service and appointment tables without touching the vector index,
+        for callers such as scheduling that must not wait for embeddings.
+        :return: (services, appointments) DataFrames.
+        """
+        import pandas as pd
 
-    def load_and_index_data(self):
-        """Load data from CSV, convert to documents, and index with FAISS."""
         if not os.path.exists(self.dataset_path):
             raise FileNotFoundError(f"Dataset not found at: {self.dataset_path}")
-        
-        data = pd.read_csv(self.dataset_path)
+        return self._split_catalog(pd.read_csv(self.dataset_path))
+
+    @staticmethod
+    def _service_texts(services):
+        """Render one document per service row without iterating in Python."""
+        return (
+            "Service: " + services["Service Name"].astype(str)
+            + "\nDescription: " + services["Description"].astype(str)
+            + "\nPrice: " + services["Price"].astype(str)
+            + "\nSpecialist: " + services["Specialist"].astype(str)
+            + "\nPreparation: " + services["Preparation"].astype(str)
+            + "\nDuration: " + services["Duration (mins)"].astype(str) + " minutes."
+        ).tolist()
+
+    def load_and_index_data(self, force_rebuild=False):
+        """
+        Load the CSV, keep appointments as a structured table and index only the services with FAISS.
+        Each service keeps a stable ID (its name) and a content fingerprint, so a reload only embeds
+        new or changed services and deletes removed ones. The index is cached on disk between runs.
+        :param force_rebuild: Ignore the existing index and re-embed every service.
+        :return: Dict with the IDs that were added, updated and removed.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        services, appointments = self.read_tables()
+        texts = self._service_texts(services)
+        ids = services["Service Name"].astype(str).tolist()
+        fingerprints = {doc_id: self._fingerprint(text) for doc_id, text in zip(ids, texts)}
+        metadatas = [{"service": doc_id} for doc_id in ids]
+
+        with self._reload_lock:
+            if force_rebuild:
+                store, old_fingerprints = None, {}
+            elif self.vector_store is not None:
+                store, old_fingerprints = self.vector_store, self.fingerprints
+            else:
+                store, old_fingerprints = self._load_cached_index()
+
+            changes = {
+                "added": [doc_id for doc_id in ids if doc_id not in old_fingerprints],
+                "updated": [doc_id for doc_id in ids if doc_id in old_fingerprints and old_fingerprints[doc_id] != fingerprints[doc_id]],
+                "removed": [doc_id for doc_id in old_fingerprints if doc_id not in fingerprints],
+            }
+
+            if store is None:
+                # Create embeddings and index using FAISS
+                store = FAISS.from_texts(texts, self._get_embeddings(), metadatas=metadatas, ids=ids)
+            else:
+                stale = changes["updated"] + changes["removed"]
+                fresh = set(changes["added"] + changes["updated"])
+                positions = [i for i, doc_id in enumerate(ids) if doc_id in fresh]
+                # Embed outside the lock; only the FAISS mutation has to exclude concurrent searches.
+                vectors = self._get_embeddings().embed_documents([texts[i] for i in positions]) if positions else []
+                with self._lock:
+                    if stale:
+                        store.delete(stale)
+                    if positions:
+                        store.add_embeddings(
+                            [(texts[i], vector) for i, vector in zip(positions, vectors)],
+                            metadatas=[metadatas[i] for i in positions],
+                            ids=[ids[i] for i in positions],
+                        )
+
+            index_key = self._compute_index_key(texts)
+            if self.index_key is not None and index_key != self.index_key:
+                # Cached results point into the previous index.
+                self.result_cache.clear()
+
+            # Swap the in-memory views in one go so readers see either the old or the new catalog.
+            self.services, self.appointments = services, appointments
+            self.documents = texts
+            self._doc_ids = {text: doc_id for doc_id, text in enumerate(texts)}
+            self.lexical_index = BM25Index(texts, names=services["Service Name"].tolist())
+            self.vector_store = store
+            self.fingerprints = fingerprints
+            self.index_key = index_key
+            if force_rebuild or any(changes.values()) or not os.path.exists(self._manifest_path()):
+                self._save_index(index_key)
+        return changes
+
+    def load_in_background(self):
+        """
+        Start `load_and_index_data` on a worker thread unless it is already running or done.
+        :return: concurrent.futures.Future of the load.
+        """
+        with self._load_future_lock:
+            future = self._load_future
+            if future is None or (future.done() and future.exception() is not None):
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-warmup")
+                future = self._load_future = executor.submit(self.load_and_index_data)
+                executor.shutdown(wait=False)
+        return future
 
-        # Convert to LangChain Document format
-        documents = []
-        for _, row in data.iterrows():
-            content = f"Service: {row['Service Name']}\nDescription: {row['Description']}\nPrice: {row['Price']}\nSpecialist: {row['Specialist']}\nPreparation: {row['Preparation']}\nDuration: {row['Duration (mins)']} minutes."
-            documents.append(Document(page_content=content))
+    def wait_until_ready(self):
+        """Block until the index is loaded, starting the load if nobody has yet."""
+        if self.vector_store is None:
+            self.load_in_background().result()
 
-        # Create embeddings and index using FAISS
-        embeddings = OpenAIEmbeddings(model=self.embedding_model)
-        self.vector_store = FAISS.from_documents(documents, embeddings)
+    async def await_ready(self):
+        """Await the index without blocking the event loop, starting the load if nobody has yet."""
+        if self.vector_store is None:
+            await asyncio.wrap_future(self.load_in_background())
+
+    def watch(self, interval=1.0, on_reload=None):
+        """
+        Apply dataset edits live: re-run the incremental load whenever the CSV changes on disk.
+        Runs on a daemon thread until `stop_watching` is called.
+        :param interval: Seconds to debounce file system events.
+        :param on_reload: Optional callable `(previous index_key, changes)` run on the watcher thread after each reload.
+        """
+        from watchfiles import watch
+
+        if self._watcher is not None:
+            return
+        stop_event = threading.Event()
+
+        def run():
+            for file_changes in watch(os.path.dirname(self.dataset_path), stop_event=stop_event, debounce=int(interval * 1000)):
+                if not any(os.path.abspath(path) == self.dataset_path for _, path in file_changes):
+                    continue
+                previous_key = self.index_key
+                try:
+                    changes = self.load_and_index_data()
+                    print(f"Reindexed {self.filename}: {changes}")
+                    if on_reload is not None:
+                        on_reload(previous_key, changes)
+                except Exception as e:
+                    print(f"Failed to reindex {self.filename}: {e}")
+
+        self._watcher = (threading.Thread(target=run, name="rag-watcher", daemon=True), stop_event)
+        self._watcher[0].start()
+
+    def stop_watching(self):
+        if self._watcher is None:
+            return
+        thread, stop_event = self._watcher
+        stop_event.set()
+        thread.join()
+        self._watcher = None
 
     def retrieve(self, query, top_k=3):
         """
@@ -42,11 +317,113 @@ class DentalServiceRAG:
         :param top_k: Number of top documents to return.
         :return: List of top-k relevant document content.
         """
+        self.wait_until_ready()
+        normalized, top_k, result_key, contents = self._start_retrieval(query, top_k)
+        if contents is not None:
+            return contents
+
+        depth = max(top_k, self.FUSION_DEPTH)
+        embedding = self._embed_query(normalized)
+        vector_results = self._search_by_vector(embedding, depth)
+        return self._finish_hybrid(normalized, top_k, result_key, vector_results)
+
+    async def aretrieve(self, query, top_k=3):
+        """
+        Retrieve the most relevant documents for a given query.
+        :param query: The query to search the dataset for.
+        :param top_k: Number of top documents to return.
+        :return: List of top-k relevant document content.
+        """
+        await self.await_ready()
+        normalized, top_k, result_key, contents = self._start_retrieval(query, top_k)
+        if contents is not None:
+            return contents
+
+        # Embed without blocking the event loop and run the FAISS search on a worker thread.
+        depth = max(top_k, self.FUSION_DEPTH)
+        embedding = await self._aembed_query(normalized)
+        vector_results = await asyncio.to_thread(self._search_by_vector, embedding, depth)
+        return self._finish_hybrid(normalized, top_k, result_key, vector_results)
+
+    def _start_retrieval(self, query, top_k):
+        """
+        Resolve a query from the result cache or the lexical fast path.
+        :return: (normalized query, top_k, result cache key, contents or None when a vector search is needed).
+        """
         if not self.vector_store:
             raise ValueError("The data has not been indexed. Call load_and_index_data first.")
 
         # Ensure top_k is an integer
         top_k = int(top_k)
 
-        results = self.vector_store.similarity_search(query, k=top_k)
-        return [result.page_content for result in results]
+        normalized = normalize_query(query)
+        # Results are keyed on the index they came from, so a rebuilt index never serves stale hits.
+        result_key = f"{self.index_key}|{top_k}|{normalized}"
+        cached = self.result_cache.get(result_key)
+        if cached is not None:
+            self.retrieval_paths["cache"] += 1
+            return normalized, top_k, result_key, list(cached)
+
+        doc_ids = self._lexical_fast_path(normalized, top_k)
+        if doc_ids is None:
+            return normalized, top_k, result_key, None
+        self.retrieval_paths["lexical"] += 1
+        return normalized, top_k, result_key, self._store_result(result_key, doc_ids)
+
+    def _search_by_vector(self, embedding, k):
+        with self._lock:
+            return self.vector_store.similarity_search_by_vector(embedding, k=k)
+
+    def _finish_hybrid(self, normalized, top_k, result_key, vector_results):
+        """Fuse the BM25 ranking with the FAISS results and cache the outcome."""
+        self.retrieval_paths["hybrid"] += 1
+        depth = max(top_k, self.FUSION_DEPTH)
+        lexical_ranking = [doc_id for doc_id, _ in self.lexical_index.search(normalized, k=depth)]
+        vector_ranking = [self._doc_ids[doc.page_content] for doc in vector_results if doc.page_content in self._doc_ids]
+        doc_ids = reciprocal_rank_fusion([lexical_ranking, vector_ranking])[:top_k]
+        return self._store_result(result_key, doc_ids)
+
+    def _store_result(self, result_key, doc_ids):
+        contents = [self.documents[doc_id] for doc_id in doc_ids]
+        self.result_cache.put(result_key, contents)
+        return list(contents)
+
+    def _lexical_fast_path(self, normalized_query, top_k):
+        """
+        Answer from the BM25 index alone when the query names a service or matches one unambiguously.
+        :return: Ranked document ids, or None when an embedding is needed.
+        """
+        ranked = self.lexical_index.search(normalized_query)
+        named = self.lexical_index.name_matches(normalized_query)
+        if named:
+            rest = [doc_id for doc_id, _ in ranked if doc_id not in named]
+            return (named + rest)[:top_k]
+        if not ranked or ranked[0][1] < self.LEXICAL_MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < self.LEXICAL_MARGIN * ranked[1][1]:
+            return None
+        return [doc_id for doc_id, _ in ranked[:top_k]]
+
+    def _embed_query(self, normalized_query):
+        embedding_key = f"{self._embedder_identity()}|{normalized_query}"
+        embedding = self.embedding_cache.get(embedding_key)
+        if embedding is None:
+            embedding = self._get_embeddings().embed_query(normalized_query)
+            self.embedding_cache.put(embedding_key, embedding)
+        return embedding
+
+    async def _aembed_query(self, normalized_query):
+        embedding_key = f"{self._embedder_identity()}|{normalized_query}"
+        embedding = self.embedding_cache.get(embedding_key)
+        if embedding is None:
+            embedding = await self._get_embeddings().aembed_query(normalized_query)
+            self.embedding_cache.put(embedding_key, embedding)
+        return embedding
+
+    async def aembed_query(self, query):
+        """
+        Embed a free-text query with the index's embedding model, sharing the query embedding cache.
+        :param query: The text to embed.
+        :return: The embedding vector.
+        """
+        return await self._aembed_query(normalize_query(query))
@@ -0,0 +1,136 @@
+import numpy as np
+import threading
+import time
+
+
+class SemanticResponseCache:
+    def __init__(self, embed, threshold=0.95, max_entries=512, ttl=86400, min_query_words=3, cacheable_tools=("aretrieve", "retrieve")):
+        """
+        Cache of final answers keyed by the similarity of the user's question embedding.
+        :param embed: Coroutine `text -> vector` used to embed questions.
+        :param threshold: Minimum cosine similarity for a cached answer to be reused.
+        :param max_entries: Entries kept across all scopes; the least recently used entry is evicted first.
+        :param ttl: Seconds an answer stays valid.
+        :param min_query_words: Shorter messages ("yes", "ok thanks") depend on the conversation and are never cached.
+        :param cacheable_tools: Read-only retrieval tools; only turns that called one and no other tool are cached.
+        """
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_query_words = min_query_words
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self._scopes = {}  # scope -> {"vectors": ndarray, "entries": [entry dicts]}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.lookup_seconds = 0.0
+
+    def accepts(self, query):
+        return len(query.split()) >= self.min_query_words
+
+    async def lookup(self, scope, query):
+        """
+        Find a cached answer for `query` within `scope` (e.g. agent name and catalog version).
+        :return: (answer or None, query vector to pass to `store` on a miss).
+        """
+        if not self.accepts(query):
+            return None, None
+        start = time.perf_counter()
+        vector = self._normalize(await self.embed(query))
+        now = time.time()
+        with self._lock:
+            entry = self._best_match(scope, vector, now)
+            if entry is not None:
+                entry["last_hit"] = now
+                self.hits += 1
+                self.seconds_saved += entry["turn_seconds"]
+            else:
+                self.misses += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return (entry["answer"] if entry else None), vector
+
+    def cacheable(self, turn_messages):
+        """
+        A turn can be cached when it answered from retrieval: it called at least one cacheable tool, no other
+        tool, and ended with an answer. Answers without a lookup (greetings, small talk) are not worth keeping.
+        """
+        names = {
+            tool_call["function"]["name"]
+            for message in turn_messages
+            for tool_call in message.get("tool_calls") or []
+        }
+        if not names or not names <= self.cacheable_tools:
+            return False
+        return bool(turn_messages[-1].get("content"))
+
+    def store(self, scope, vector, answer, turn_seconds):
+        now = time.time()
+        with self._lock:
+            bucket = self._scopes.setdefault(scope, {"vectors": np.empty((0, len(vector)), dtype=np.float32), "entries": []})
+            bucket["vectors"] = np.vstack([bucket["vectors"], vector[None, :]])
+            bucket["entries"].append({"answer": answer, "created": now, "last_hit": now, "turn_seconds": turn_seconds})
+            self._evict(now)
+
+    def invalidate_where(self, predicate):
+        """Drop every scope for which `predicate(scope)` is true, e.g. all scopes of an old catalog version."""
+        with self._lock:
+            for scope in [scope for scope in self._scopes if predicate(scope)]:
+                del self._scopes[scope]
+
+    def invalidate(self, scope=None):
+        with self._lock:
+            if scope is None:
+                self._scopes.clear()
+            else:
+                self._scopes.pop(scope, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(len(bucket["entries"]) for bucket in self._scopes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "avg_lookup_seconds": self.lookup_seconds / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _best_match(self, scope, vector, now):
+        bucket = self._scopes.get(scope)
+        if not bucket or not bucket["entries"]:
+            return None
+        similarities = bucket["vectors"] @ vector
+        best = int(np.argmax(similarities))
+        entry = bucket["entries"][best]
+        if similarities[best] < self.threshold or now - entry["created"] > self.ttl:
+            return None
+        return entry
+
+    def _evict(self, now):
+        """Drop expired entries, then the least recently used ones until `max_entries` remain."""
+        candidates = []
+        for scope, bucket in self._scopes.items():
+            for position, entry in enumerate(bucket["entries"]):
+                candidates.append((now - entry["created"] > self.ttl, entry["last_hit"], scope, position))
+        excess = len(candidates) - self.max_entries
+        doomed = {}
+        for expired, last_hit, scope, position in sorted(candidates, key=lambda c: (not c[0], c[1])):
+            if not expired and excess <= 0:
+                break
+            doomed.setdefault(scope, set()).add(position)
+            excess -= 1
+        for scope, positions in doomed.items():
+            bucket = self._scopes[scope]
+            keep = [i for i in range(len(bucket["entries"])) if i not in positions]
+            bucket["entries"] = [bucket["entries"][i] for i in keep]
+            bucket["vectors"] = bucket["vectors"][keep]
+            if not bucket["entries"]:
+                del self._scopes[scope]
@@ -0,0 +1,239 @@
+"""
+Batch runner for scripted conversations, for regression-testing prompt and model changes offline.
+
+Every line of the input file is one conversation:
+    {"id": "booking-1", "turns": ["I need a cleaning", "Next Tuesday at 10 works"],
+     "answers": ["yes", "5 - quick and friendly"], "agent": "qa"}
+- turns: user messages, sent one after the other through the same Agents and `run_full_turn` as the app,
+- answers: replies to the questions tools ask the user (booking confirmations, feedback), used in order;
+  once they run out every question gets --default-answer,
+- agent: optional starting agent (qa, scheduling or feedback), the Q&A agent otherwise.
+
+Conversations run concurrently on a bounded pool of workers. Each finished conversation is appended to the
+results file as one JSON line with its transcript, the agents it passed through, per-turn latency, tokens and
+cost, so an interrupted run picks up where it stopped: conversations already in the results file are skipped
+(failed ones are retried). Tool side effects (bookings, escalations, spilled sessions) go to --state-dir.
+
+Run from assessment/llm_code:
+    python run_batch.py conversations.jsonl --out results.jsonl --workers 32
+    python run_batch.py conversations.jsonl --out dry_run.jsonl --mock     # scripted stand-in, no API calls
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+
+
+def read_conversations(path):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            conversation.setdefault("id", f"line-{number}")
+            if isinstance(conversation.get("turns"), str) or not conversation.get("turns"):
+                raise ValueError(f"{path}:{number}: 'turns' must be a non-empty list of user messages")
+            yield conversation
+
+
+def finished_ids(path):
+    """Ids that already have a successful result; a later line for the same id wins."""
+    status = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:  # a line cut short by the interruption
+                    continue
+                status[result.get("id")] = result.get("status")
+    return {conversation_id for conversation_id, value in status.items() if value == "ok"}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class ScriptedUser:
+    def __init__(self, answers, default_answer):
+        """Answers questions from tools in order, recording each exchange."""
+        self.answers = list(answers)
+        self.default_answer = default_answer
+        self.turn = 0
+        self.prompts = []
+
+    async def __call__(self, question, timeout):
+        answer = self.answers.pop(0) if self.answers else self.default_answer
+        self.prompts.append({"turn": self.turn, "question": question, "answer": answer})
+        return answer
+
+
+async def run_conversation(main, human_input, starting_agents, conversation, default_answer):
+    from chainlit.context import init_http_context
+    from sessions import Session
+
+    # A fresh Chainlit context per conversation, as each chat has in the app; the instrumented client needs one.
+    init_http_context()
+    user = ScriptedUser(conversation.get("answers", []), default_answer)
+    human_input.handler.set(user)
+
+    agent = starting_agents[conversation.get("agent") or "qa"]
+    session = Session(id=f"batch-{conversation['id']}", agent=agent)
+    transcript = []
+    turns = []
+    path = [agent.name]
+    started = time.perf_counter()
+    for index, content in enumerate(conversation["turns"]):
+        user.turn = index
+        message = {"role": "user", "content": content}
+        session.messages.append(message)
+        transcript.append(message)
+        response = None
+        async for response in main.run_full_turn(session.agent, session.messages, summary=session.summary):
+            pass
+        session.agent = response.agent
+        session.messages.extend(response.messages)
+        transcript.extend(response.messages)
+        main.context_window.maybe_summarize(session)
+
+        metrics = response.metrics
+        path.extend(name for name in metrics["agent_path"][1:] if name != path[-1])
+        turns.append({
+            "user": content,
+            "reply": response.messages[-1].get("content"),
+            "agent": response.agent.name,
+            "agent_path": metrics["agent_path"],
+            "tools": [
+                tool_call["function"]["name"]
+                for message in response.messages
+                for tool_call in message.get("tool_calls") or []
+            ],
+            "latency": metrics["turn_seconds"],
+            "iterations": metrics["iterations"],
+            "tokens": metrics["tokens"],
+            "cost_usd": metrics["cost_usd"],
+            "limit": metrics["limit"],
+        })
+
+    latencies = [turn["latency"] for turn in turns]
+    return {
+        "id": conversation["id"],
+        "status": "ok",
+        "handoff_path": path,
+        "final_agent": session.agent.name,
+        "seconds": time.perf_counter() - started,
+        "latency": {"mean": statistics.mean(latencies), "max": max(latencies)},
+        "tokens": sum(turn["tokens"] for turn in turns),
+        "cost_usd": sum(turn["cost_usd"] for turn in turns),
+        "limits": [turn["limit"] for turn in turns if turn["limit"]],
+        "turns": turns,
+        "prompts": user.prompts,
+        "transcript": transcript,
+    }
+
+
+async def run(args, console):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        import human_input
+        from agents import qa_agent, scheduling_agent, feedback_agent, get_escalation_queue
+        await main.rag.await_ready()
+    starting_agents = {"qa": qa_agent, "scheduling": scheduling_agent, "feedback": feedback_agent}
+
+    done = finished_ids(args.out)
+    pending = [conversation for conversation in read_conversations(args.conversations) if conversation["id"] not in done]
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"{len(done)} conversations already in {args.out}, {len(pending)} to run on {args.workers} workers", file=console)
+
+    queue = asyncio.Queue()
+    for conversation in pending:
+        queue.put_nowait(conversation)
+    results = []
+    start = time.perf_counter()
+
+    async def worker(out):
+        while not queue.empty():
+            conversation = queue.get_nowait()
+            try:
+                result = await run_conversation(main, human_input, starting_agents, conversation, args.default_answer)
+            except Exception as e:
+                result = {"id": conversation["id"], "status": "error", "error": f"{type(e).__name__}: {e}",
+                          "traceback": traceback.format_exc()}
+            # One line per conversation, flushed at once, so an interruption loses only the ones in flight
+            out.write(json.dumps(result, default=str) + "\n")
+            out.flush()
+            results.append(result)
+            if args.progress and len(results) % args.progress == 0:
+                print(f"  {len(results)}/{len(pending)} in {time.perf_counter() - start:.1f} s", file=console)
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    with open(args.out, "a", encoding="utf-8") as out, contextlib.redirect_stdout(output):
+        await asyncio.gather(*(worker(out) for _ in range(args.workers)))
+        await get_escalation_queue().stop()
+    elapsed = time.perf_counter() - start
+
+    finished = [result for result in results if result["status"] == "ok"]
+    failed = len(results) - len(finished)
+    print(f"== {len(results)} conversations in {elapsed:.1f} s ({len(results) / max(elapsed, 1e-9):.1f}/s), "
+          f"{failed} failed", file=console)
+    latencies = [turn["latency"] for result in finished for turn in result["turns"]]
+    if latencies:
+        print(f"  turns {len(latencies)}, latency p50 {percentile(latencies, 50):.3f}s  "
+              f"p95 {percentile(latencies, 95):.3f}s  max {max(latencies):.3f}s", file=console)
+        print(f"  tokens {sum(result['tokens'] for result in finished)}, "
+              f"cost ${sum(result['cost_usd'] for result in finished):.4f}, "
+              f"turns stopped by limits {sum(len(result['limits']) for result in finished)}", file=console)
+        print(f"  client {main.llm.stats()}", file=console)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("conversations", help="JSONL file with one scripted conversation per line")
+    parser.add_argument("--out", default="batch_results.jsonl", help="JSONL results file, appended to and used to resume")
+    parser.add_argument("--workers", type=int, default=16, help="Conversations in flight at once")
+    parser.add_argument("--limit", type=int, default=0, help="Run at most this many pending conversations")
+    parser.add_argument("--default-answer", default="yes", help="Answer to tool questions once a script runs out")
+    parser.add_argument("--state-dir", help="Folder for bookings, escalations and spilled sessions (default: a temp dir)")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint to run against instead of the API")
+    parser.add_argument("--mock", action="store_true", help="Start the scripted stand-in from mock_openai.py")
+    parser.add_argument("--progress", type=int, default=100, help="Report progress every N conversations (0: never)")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own logging")
+    args = parser.parse_args()
+
+    # Keep batch bookings and escalations out of the clinic's data; explicit env settings still win.
+    state_dir = args.state_dir or tempfile.mkdtemp(prefix="run_batch_")
+    os.makedirs(state_dir, exist_ok=True)
+    for name, filename in (("APPOINTMENTS_DB", "appointments.sqlite"), ("ESCALATIONS_DB", "escalations.sqlite"),
+                           ("SESSION_SPILL_PATH", "sessions.sqlite")):
+        os.environ.setdefault(name, os.path.join(state_dir, filename))
+
+    base_url = args.base_url
+    if args.mock and not base_url:
+        from mock_openai import serve_in_process
+
+        _, base_url = serve_in_process(latency=0.05, jitter=0.5)
+        # The stand-in has no account limits to respect
+        os.environ.update({"OPENAI_API_KEY": "mock", "OPENAI_RPM": "1000000", "OPENAI_TPM": "1000000000"})
+    if base_url:
+        os.environ.update({"OPENAI_BASE_URL": base_url, "OPENAI_API_BASE": base_url})
+        import agents
+        from langchain_openai import OpenAIEmbeddings
+
+        # Local endpoints take raw text and their vectors must not land in the real index cache.
+        agents.rag.index_folder = os.path.join(state_dir, ".index_cache")
+        agents.rag.embeddings = OpenAIEmbeddings(model=agents.rag.embedding_model, check_embedding_ctx_length=False)
+
+    asyncio.run(run(args, sys.stdout))
+
+
+if __name__ == "__main__":
+    main()
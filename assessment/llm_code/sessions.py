@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from contextlib import closing
+from pydantic import BaseModel
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+
+class Session(BaseModel):
+    id: str
+    agent: object
+    messages: list = []
+    summary: str = ""
+    last_active: float = 0.0
+
+
+class SessionStore:
+    def __init__(self, default_agent, agents=(), max_sessions=256, ttl=1800, max_messages=200, spill_path=None):
+        """
+        Per-session conversation state with bounded memory.
+        :param default_agent: Agent a new session starts with.
+        :param agents: All agents a session can be handed off to; used to restore spilled sessions by name.
+        :param max_sessions: Sessions kept in memory; the least recently active one is evicted first.
+        :param ttl: Seconds of inactivity after which a session is evicted.
+        :param max_messages: Messages kept per session; older turns are dropped at a user-message boundary.
+        :param spill_path: Optional SQLite file evicted sessions are written to, so they can resume later.
+        """
+        self.default_agent = default_agent
+        self.agents = {agent.name: agent for agent in (default_agent, *agents)}
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.spill_path = spill_path
+        self._sessions = OrderedDict()
+        self._spilling = {}  # evicted sessions whose spill write has not finished, by id
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.resumes = 0
+        if spill_path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "id TEXT PRIMARY KEY, agent TEXT NOT NULL, messages TEXT NOT NULL, last_active REAL NOT NULL, "
+                    "summary TEXT NOT NULL DEFAULT '')"
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+                if "summary" not in columns:  # spill files written before summaries existed
+                    conn.execute("ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self):
+        return sqlite3.connect(self.spill_path, timeout=10)
+
+    # The lock only guards the in-memory maps. Spill file reads and writes happen after it is released;
+    # the async variants run them on a worker thread so an eviction never stalls the event loop.
+
+    def get(self, session_id):
+        """Return the session, resuming it from the spill file or creating it when needed."""
+        now = time.time()
+        session, evicted = self._lookup(session_id, now)
+        self._spill(evicted)
+        if session is None:
+            session = self._load_spilled(session_id) or Session(id=session_id, agent=self.default_agent)
+            self._spill(self._insert(session, now))
+        return session
+
+    async def aget(self, session_id):
+        """`get` for the event loop."""
+        now = time.time()
+        session, evicted = self._lookup(session_id, now)
+        await self._aspill(evicted)
+        if session is None:
+            session = await asyncio.to_thread(self._load_spilled, session_id) if self.spill_path else None
+            session = session or Session(id=session_id, agent=self.default_agent)
+            await self._aspill(self._insert(session, now))
+        return session
+
+    def save(self, session):
+        """Record the end of a turn: refresh recency and trim the history to `max_messages`."""
+        session.messages = self._trim(session.messages)
+        self._spill(self._insert(session, time.time()))
+
+    async def asave(self, session):
+        """`save` for the event loop."""
+        session.messages = self._trim(session.messages)
+        await self._aspill(self._insert(session, time.time()))
+
+    def close(self, session_id):
+        """Drop a finished chat from memory, spilling it if a spill file is configured."""
+        self._spill(self._pop(session_id))
+
+    async def aclose(self, session_id):
+        """`close` for the event loop."""
+        await self._aspill(self._pop(session_id))
+
+    def _lookup(self, session_id, now):
+        """:return: (the session if it is in memory, sessions evicted for being idle)."""
+        with self._lock:
+            evicted = self._evict_expired(now)
+            # A session whose spill is still being written is taken back as is.
+            session = self._sessions.get(session_id) or self._spilling.pop(session_id, None)
+            if session is not None:
+                self._sessions[session_id] = session
+                self._sessions.move_to_end(session_id)
+                session.last_active = now
+        return session, evicted
+
+    def _insert(self, session, now):
+        """:return: Sessions evicted to make room."""
+        session.last_active = now
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            return self._evict_over_capacity()
+
+    def _pop(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return []
+            if self.spill_path:
+                self._spilling[session_id] = session
+            return [session]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "resumes": self.resumes,
+        }
+
+    def _trim(self, messages):
+        if len(messages) <= self.max_messages:
+            return messages
+        start = len(messages) - self.max_messages
+        # Never start mid-turn, or a tool result could lose the assistant message that requested it.
+        while start < len(messages) and _role(messages[start]) != "user":
+            start += 1
+        return messages[start:]
+
+    def _evict_expired(self, now):
+        expired = []
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active < self.ttl:
+                break
+            expired.append(self._sessions.popitem(last=False)[1])
+        return self._mark_evicted(expired)
+
+    def _evict_over_capacity(self):
+        evicted = []
+        while len(self._sessions) > self.max_sessions:
+            evicted.append(self._sessions.popitem(last=False)[1])
+        return self._mark_evicted(evicted)
+
+    def _mark_evicted(self, sessions):
+        """Called under the lock; the caller spills the returned sessions once it has released it."""
+        self.evictions += len(sessions)
+        if not self.spill_path:
+            return []
+        for session in sessions:
+            self._spilling[session.id] = session
+        return sessions
+
+    async def _aspill(self, sessions):
+        if sessions:
+            await asyncio.to_thread(self._spill, sessions)
+
+    def _spill(self, sessions):
+        if not self.spill_path or not sessions:
+            return
+        rows = [(s.id, s.agent.name, json.dumps(s.messages), s.last_active, s.summary) for s in sessions]
+        try:
+            self._write_spilled(rows)
+        finally:
+            with self._lock:
+                for session in sessions:
+                    if self._spilling.get(session.id) is session:
+                        del self._spilling[session.id]
+
+    def _write_spilled(self, rows):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (id, agent, messages, last_active, summary) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def _load_spilled(self, session_id):
+        if not self.spill_path:
+            return None
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT agent, messages, summary FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self.resumes += 1
+        agent_name, messages, summary = row
+        return Session(
+            id=session_id,
+            agent=self.agents.get(agent_name, self.default_agent),
+            messages=json.loads(messages),
+            summary=summary,
+        )
+
+
+def _role(message):
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
@@ -0,0 +1,118 @@
+from pydantic import ConfigDict, ValidationError, create_model
+from typing import Optional, get_type_hints
+import inspect
+import json
+
+
+def _strip_titles(schema):
+    """Drop the `title` keys pydantic adds; they only cost prompt tokens."""
+    if isinstance(schema, dict):
+        return {key: _strip_titles(value) for key, value in schema.items() if key != "title" or not isinstance(value, str)}
+    if isinstance(schema, list):
+        return [_strip_titles(item) for item in schema]
+    return schema
+
+
+def _parameter_type(param, hints):
+    """Annotation of a parameter, else the type of its default, else str (what the schema has always told the model).
+    A bare `= None` default makes it Optional[str], so the model may send null."""
+    if param.name in hints:
+        return hints[param.name]
+    if param.default is None:
+        return Optional[str]
+    if param.default is not inspect.Parameter.empty:
+        return type(param.default)
+    return str
+
+
+def arguments_model(func):
+    """Build a pydantic model of the function's keyword arguments from its signature and type hints."""
+    try:
+        signature = inspect.signature(func)
+    except ValueError as e:
+        raise ValueError(f"Failed to get signature for function {func.__name__}: {str(e)}")
+    try:
+        hints = get_type_hints(func)
+    except Exception:
+        hints = {}
+
+    fields = {}
+    for param in signature.parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        default = ... if param.default is inspect.Parameter.empty else param.default
+        fields[param.name] = (_parameter_type(param, hints), default)
+    return create_model(f"{func.__name__}_arguments", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+def function_to_schema(func, model=None):
+    """Converts a Python function into an OpenAI tool schema."""
+    model = model or arguments_model(func)
+    parameters = _strip_titles(model.model_json_schema())
+    parameters.pop("additionalProperties", None)
+    parameters.setdefault("properties", {})
+    parameters.setdefault("required", [])
+
+    return {
+        "type": "function",
+        "function": {
+            "name": func.__name__,
+            "description": (func.__doc__ or "").strip(),
+            "parameters": parameters,
+        },
+    }
+
+
+class CompiledTools:
+    def __init__(self, tools):
+        """
+        Tool schemas, the name -> callable map and argument validators for one list of tools.
+        :param tools: The agent's tool functions.
+        """
+        self.tools = tuple(tools)
+        self.functions = {}
+        self.models = {}
+        self.schemas = []
+        # Tools that ask the user in the chat (see human_input.interactive); they must not run concurrently.
+        self.interactive = frozenset(tool.__name__ for tool in self.tools if getattr(tool, "interactive", False))
+        for tool in self.tools:
+            model = arguments_model(tool)
+            self.functions[tool.__name__] = tool
+            self.models[tool.__name__] = model
+            self.schemas.append(function_to_schema(tool, model))
+
+    def parse_arguments(self, name, raw_arguments):
+        """
+        Decode and validate a tool call's arguments.
+        :return: (kwargs, None) on success, or (None, error message for the model) when the call is unusable.
+        """
+        if name not in self.functions:
+            return None, f"Error: unknown tool '{name}'. Available tools: {', '.join(self.functions)}."
+        try:
+            arguments = json.loads(raw_arguments or "{}")
+        except json.JSONDecodeError as e:
+            return None, f"Error: the arguments for '{name}' are not valid JSON ({e.msg}). Call the tool again with a JSON object."
+        if not isinstance(arguments, dict):
+            return None, f"Error: the arguments for '{name}' must be a JSON object."
+        try:
+            validated = self.models[name].model_validate(arguments)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'arguments'}: {error['msg']}" for error in e.errors())
+            return None, f"Error: invalid arguments for '{name}': {problems}. Call the tool again with corrected arguments."
+        # Only pass what the model sent so the function's own defaults still apply.
+        return {field: getattr(validated, field) for field in validated.model_fields_set}, None
+
+
+_compiled_tools = {}
+
+
+def compile_tools(agent):
+    """Return the CompiledTools for an agent, compiling them only when its tool list changes."""
+    tools = tuple(agent.tools)
+    cached = _compiled_tools.get(id(agent))
+    if cached is not None and cached[0] is agent and cached[1].tools == tools:
+        return cached[1]
+    compiled = CompiledTools(tools)
+    # Keep a reference to the agent so its id cannot be reused by another object.
+    _compiled_tools[id(agent)] = (agent, compiled)
+    return compiled
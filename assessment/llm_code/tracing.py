@@ -0,0 +1,151 @@
+from contextlib import contextmanager
+import bisect
+import contextvars
+import json
+import queue
+import threading
+import time
+import uuid
+
+# Upper bounds in seconds; spans range from sub-millisecond tool calls to long completions.
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 20)
+
+# (trace id, span id) of the span the current task is inside, so nested and concurrent spans link up.
+_current = contextvars.ContextVar("current_span", default=(None, None))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    escaped = ((key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels)
+    return ",".join(f'{key}="{value}"' for key, value in escaped)
+
+
+class Tracer:
+    def __init__(self, trace_path=None):
+        """
+        Structured spans for agent turns, aggregated into Prometheus-style histograms.
+        :param trace_path: Optional JSONL file every finished span is appended to, by a background writer.
+        """
+        self.trace_path = trace_path
+        self.histograms = {}  # (metric, labels) -> Histogram
+        self.counters = {}  # (metric, labels) -> value
+        self.gauges = {}  # prefix -> callable returning a dict of numbers
+        self._lock = threading.Lock()
+        self._queue = None
+        if trace_path:
+            self._queue = queue.SimpleQueue()
+            threading.Thread(target=self._write, name="trace-writer", daemon=True).start()
+
+    @contextmanager
+    def span(self, kind, **attributes):
+        """
+        Time a block as a span of `kind` (turn, completion, tool, retrieval, handoff).
+        Yields the attribute dict, so token counts and other results can be added inside the block.
+        """
+        trace_id, parent_id = _current.get()
+        span_id = uuid.uuid4().hex[:16]
+        token = _current.set((trace_id or span_id, span_id))
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                _current.reset(token)
+            except ValueError:  # an async generator finalised outside the context it started in
+                pass
+            self.record(kind, duration, trace_id=trace_id or span_id, span_id=span_id, parent_id=parent_id, **attributes)
+
+    def record(self, kind, duration, trace_id=None, span_id=None, parent_id=None, **attributes):
+        """Aggregate a finished span and queue it for the trace file."""
+        if trace_id is None:
+            trace_id, parent_id = _current.get()
+        name = attributes.get("model") or attributes.get("tool") or ""
+        labels = (("kind", kind), ("agent", attributes.get("agent", "")), ("name", name), ("tier", attributes.get("tier", "")))
+        with self._lock:
+            self._histogram("agent_span_seconds", labels, DURATION_BUCKETS).observe(duration)
+            for token_type in ("prompt_tokens", "completion_tokens"):
+                if attributes.get(token_type):
+                    key = ("agent_tokens_total", labels[1:] + (("type", token_type.split("_")[0]),))
+                    self.counters[key] = self.counters.get(key, 0) + attributes[token_type]
+            if attributes.get("cost_usd"):
+                key = ("agent_cost_usd_total", labels[1:])
+                self.counters[key] = self.counters.get(key, 0) + attributes["cost_usd"]
+            if kind == "turn" and "iterations" in attributes:
+                self._histogram("agent_turn_iterations", labels[1:2], ITERATION_BUCKETS).observe(attributes["iterations"])
+            if kind == "handoff":
+                key = ("agent_handoffs_total", (("from", attributes.get("agent", "")), ("to", attributes.get("to", ""))))
+                self.counters[key] = self.counters.get(key, 0) + 1
+        if self._queue is not None:
+            self._queue.put({
+                "trace_id": trace_id, "span_id": span_id, "parent_id": parent_id, "kind": kind,
+                "time": time.time() - duration, "duration": duration, **attributes,
+            })
+
+    def count(self, metric, value=1, **labels):
+        """Increment a counter, e.g. `count("agent_turn_limits_total", reason="deadline")`."""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _histogram(self, metric, labels, buckets):
+        key = (metric, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        return histogram
+
+    def _write(self):
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            while True:
+                f.write(json.dumps(self._queue.get(), default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def add_gauges(self, prefix, stats):
+        """Expose the numeric values of `stats()` (e.g. a component's stats method) as `<prefix>_<key>` gauges."""
+        self.gauges[prefix] = stats
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for metric in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {metric} histogram")
+            for (name, labels), histogram in histograms:
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{{{_labels(labels + (('le', le),))}}} {cumulative}")
+                lines.append(f"{metric}_sum{{{_labels(labels)}}} {histogram.sum}")
+                lines.append(f"{metric}_count{{{_labels(labels)}}} {histogram.count}")
+        for metric in sorted({metric for (metric, _), _ in counters}):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{{{_labels(labels)}}} {value}" for (name, labels), value in counters if name == metric)
+        for prefix, stats in sorted(self.gauges.items()):
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
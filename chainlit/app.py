@@ -3,9 +3,10 @@ from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import os
 import json
+import time
 import inspect
-from pydantic import BaseModel
-from typing import Optional, List, Dict
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from typing import Optional, List, Dict, get_type_hints
 
 
 load_dotenv()
@@ -45,7 +46,10 @@ def escalate_to_human(summary):
     print("\n=== Escalation Report ===")
     print(f"Summary: {summary}")
     print("=========================\n")
-    exit()
+    # Record the escalation for staff instead of stopping the server mid-chat
+    with open(os.getenv("ESCALATIONS_FILE", "escalations.jsonl"), "a") as f:
+        f.write(json.dumps({"summary": summary, "created_at": time.time()}) + "\n")
+    return "Escalated to a human colleague. Tell the user a staff member will contact them shortly."
 
 def execute_order(product, price: int):
     """Price should be in USD."""
@@ -144,15 +148,14 @@ async def run_full_turn(agent: Agent, messages: List[Dict[str, str]]) -> Respons
     messages = messages.copy()
 
     while True:
-        # turn python functions into tools and save a reverse map
-        tool_schemas = [function_to_schema(tool) for tool in current_agent.tools]
-        tools = {tool.__name__: tool for tool in current_agent.tools}
+        # tool schemas, the reverse map and argument validators are compiled once per agent
+        tools = compile_tools(current_agent)
 
         # === 1. get openai completion ===
         response = await client.chat.completions.create(
             model=agent.model,
             messages=[{"role": "system", "content": current_agent.instructions}] + messages,
-            tools=tool_schemas or None,
+            tools=tools.schemas or None,
         )
         message = response.choices[0].message
         messages.append({"role": message.role, "content": message.content})
@@ -184,55 +187,128 @@ async def run_full_turn(agent: Agent, messages: List[Dict[str, str]]) -> Respons
 
 def execute_tool_call(tool_call, tools, agent_name):
     name = tool_call.function.name
-    args = json.loads(tool_call.function.arguments)
+    args, error = tools.parse_arguments(name, tool_call.function.arguments)
+    if error:  # malformed call: tell the model instead of failing the turn
+        print(f"{agent_name}:", f"{name} rejected: {error}")
+        return error
 
     print(f"{agent_name}:", f"{name}({args})")
 
-    return tools[name](**args)  # call corresponding function with provided arguments
-
-def function_to_schema(func) -> dict:
-    type_map = {
-        str: "string",
-        int: "integer",
-        float: "number",
-        bool: "boolean",
-        list: "array",
-        dict: "object",
-        type(None): "null",
-    }
+    return tools.functions[name](**args)  # call corresponding function with provided arguments
+
+def _strip_titles(schema):
+    """Drop the `title` keys pydantic adds; they only cost prompt tokens."""
+    if isinstance(schema, dict):
+        return {key: _strip_titles(value) for key, value in schema.items() if key != "title" or not isinstance(value, str)}
+    if isinstance(schema, list):
+        return [_strip_titles(item) for item in schema]
+    return schema
+
 
+def _parameter_type(param, hints):
+    """Annotation of a parameter, else the type of its default, else str (what the schema has always told the model).
+    A bare `= None` default makes it Optional[str], so the model may send null."""
+    if param.name in hints:
+        return hints[param.name]
+    if param.default is None:
+        return Optional[str]
+    if param.default is not inspect.Parameter.empty:
+        return type(param.default)
+    return str
+
+
+def arguments_model(func):
+    """Build a pydantic model of the function's keyword arguments from its signature and type hints."""
     try:
         signature = inspect.signature(func)
     except ValueError as e:
         raise ValueError(f"Failed to get signature for function {func.__name__}: {str(e)}")
+    try:
+        hints = get_type_hints(func)
+    except Exception:
+        hints = {}
 
-    parameters = {}
+    fields = {}
     for param in signature.parameters.values():
-        try:
-            param_type = type_map.get(param.annotation, "string")
-        except KeyError as e:
-            raise KeyError(f"Unknown type annotation {param.annotation} for parameter {param.name}: {str(e)}")
-        parameters[param.name] = {"type": param_type}
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        default = ... if param.default is inspect.Parameter.empty else param.default
+        fields[param.name] = (_parameter_type(param, hints), default)
+    return create_model(f"{func.__name__}_arguments", __config__=ConfigDict(extra="forbid"), **fields)
+
 
-    required = [
-        param.name
-        for param in signature.parameters.values()
-        if param.default == inspect._empty
-    ]
+def function_to_schema(func, model=None):
+    """Converts a Python function into an OpenAI tool schema."""
+    model = model or arguments_model(func)
+    parameters = _strip_titles(model.model_json_schema())
+    parameters.pop("additionalProperties", None)
+    parameters.setdefault("properties", {})
+    parameters.setdefault("required", [])
 
     return {
         "type": "function",
         "function": {
             "name": func.__name__,
             "description": (func.__doc__ or "").strip(),
-            "parameters": {
-                "type": "object",
-                "properties": parameters,
-                "required": required,
-            },
+            "parameters": parameters,
         },
     }
 
+
+class CompiledTools:
+    def __init__(self, tools):
+        """
+        Tool schemas, the name -> callable map and argument validators for one list of tools.
+        :param tools: The agent's tool functions.
+        """
+        self.tools = tuple(tools)
+        self.functions = {}
+        self.models = {}
+        self.schemas = []
+        # Tools that ask the user in the chat (see human_input.interactive); they must not run concurrently.
+        self.interactive = frozenset(tool.__name__ for tool in self.tools if getattr(tool, "interactive", False))
+        for tool in self.tools:
+            model = arguments_model(tool)
+            self.functions[tool.__name__] = tool
+            self.models[tool.__name__] = model
+            self.schemas.append(function_to_schema(tool, model))
+
+    def parse_arguments(self, name, raw_arguments):
+        """
+        Decode and validate a tool call's arguments.
+        :return: (kwargs, None) on success, or (None, error message for the model) when the call is unusable.
+        """
+        if name not in self.functions:
+            return None, f"Error: unknown tool '{name}'. Available tools: {', '.join(self.functions)}."
+        try:
+            arguments = json.loads(raw_arguments or "{}")
+        except json.JSONDecodeError as e:
+            return None, f"Error: the arguments for '{name}' are not valid JSON ({e.msg}). Call the tool again with a JSON object."
+        if not isinstance(arguments, dict):
+            return None, f"Error: the arguments for '{name}' must be a JSON object."
+        try:
+            validated = self.models[name].model_validate(arguments)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(str(part) for part in error['loc']) or 'arguments'}: {error['msg']}" for error in e.errors())
+            return None, f"Error: invalid arguments for '{name}': {problems}. Call the tool again with corrected arguments."
+        # Only pass what the model sent so the function's own defaults still apply.
+        return {field: getattr(validated, field) for field in validated.model_fields_set}, None
+
+
+_compiled_tools = {}
+
+
+def compile_tools(agent):
+    """Return the CompiledTools for an agent, compiling them only when its tool list changes."""
+    tools = tuple(agent.tools)
+    cached = _compiled_tools.get(id(agent))
+    if cached is not None and cached[0] is agent and cached[1].tools == tools:
+        return cached[1]
+    compiled = CompiledTools(tools)
+    # Keep a reference to the agent so its id cannot be reused by another object.
+    _compiled_tools[id(agent)] = (agent, compiled)
+    return compiled
+
 # Initialize the agent and messages
 agent = triage_agent
 messages = []